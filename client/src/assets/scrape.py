@@ -7,6 +7,7 @@ import nltk
 from nltk.tokenize import sent_tokenize
 import time
 import logging
+import importlib.util
 nltk.download('punkt_tab')
 from enum import Enum
 
@@ -37,6 +38,11 @@ class MaterialType(Enum):
     BLOG = "blog"
     OTHER = "other"
 
+# lxml builds the same BeautifulSoup tree several times faster than the
+# pure Python html.parser, which stays as the fallback when it isn't installed
+HTML_PARSER = 'lxml' if importlib.util.find_spec('lxml') else 'html.parser'
+VIDEO_EMBED_PATTERN = re.compile(r'youtube|vimeo')
+
 class ContentScraper:
     def __init__(self):
         self.session = requests.Session()
@@ -65,10 +71,23 @@ class ContentScraper:
             logger.error(f"Error fetching {url}: {e}")
             return None
             
+    def analyze_page(self, html: str, url: str) -> Dict:
+        """Text, metadata and material type of a page from a single parse"""
+        soup = self._parse(html)
+        # Metadata first: extracting the text strips header, nav and footer
+        page = self._meta_from_soup(soup, url)
+        page["text"] = self._text_from_soup(soup)
+        return page
+        
+    @staticmethod
+    def _parse(html: str) -> BeautifulSoup:
+        return BeautifulSoup(html, HTML_PARSER)
+            
     def extract_text_content(self, html: str) -> str:
         """Extract meaningful text content from HTML"""
-        soup = BeautifulSoup(html, 'html.parser')
+        return self._text_from_soup(self._parse(html))
         
+    def _text_from_soup(self, soup: BeautifulSoup) -> str:
         # Remove script and style elements
         for script in soup(["script", "style", "nav", "footer", "header"]):
             script.decompose()
@@ -90,8 +109,9 @@ class ContentScraper:
         
     def extract_meta_information(self, html: str, url: str) -> Dict:
         """Extract metadata from the webpage"""
-        soup = BeautifulSoup(html, 'html.parser')
+        return self._meta_from_soup(self._parse(html), url)
         
+    def _meta_from_soup(self, soup: BeautifulSoup, url: str) -> Dict:
         # Extract title
         title = soup.find('title')
         title_text = title.get_text(strip=True) if title else ""
@@ -145,13 +165,17 @@ class ContentScraper:
         elif 'book' in url_lower:
             return MaterialType.BOOK
             
-        # Check content patterns
-        if soup.find('video') or soup.find('iframe', src=re.compile(r'youtube|vimeo')):
+        # Check content patterns, in one walk of the tree
+        if soup.find(self._is_video_tag):
             return MaterialType.VIDEO
         
         # Default to article for text-based content
         return MaterialType.ARTICLE
         
+    @staticmethod
+    def _is_video_tag(tag) -> bool:
+        return tag.name == 'video' or (tag.name == 'iframe' and bool(VIDEO_EMBED_PATTERN.search(tag.get('src') or '')))
+        
 class ComplexityAnalyzer:
     def __init__(self, llm_client=None):
         # Initialize with optional LLM client
@@ -285,11 +309,11 @@ class ResourcesFinder:
                 if not html:
                     continue
                     
-                text = self.scraper.extract_text_content(html)
+                meta = self.scraper.analyze_page(html, url)
+                text = meta["text"]
                 if len(text.strip()) < 100:  # Skip pages with little content
                     continue
                     
-                meta = self.scraper.extract_meta_information(html, url)
                 complexity = self.analyzer.analyze_text_complexity(text)
                 
                 # Only include resources within +/- 1 complexity level of target
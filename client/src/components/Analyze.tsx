@@ -9,6 +9,8 @@ import PdfResult from "./PdfResult";
 import "./Analyze.css";
 
 interface AnalysisResult {
+  documentId: string;
+
   extractedText: string;
 
   summary: string;
@@ -136,6 +138,7 @@ const ResourceAnalysis: React.FC = () => {
         },
         body: JSON.stringify({
           query: chatQuery,
+          documentId: analysisResult?.documentId,
           extractedText: analysisResult?.extractedText || "",
         }),
       });
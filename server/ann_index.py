@@ -0,0 +1,213 @@
+import os
+import json
+import math
+from typing import Optional, Tuple
+import numpy as np
+
+# Rows scored at a time by the exact index and during k-means assignment,
+# so memory stays bounded however large the memory-mapped matrix is
+BLOCK_ROWS = 65536
+
+class ExactIndex:
+    """Brute force inner product search. The reference the ANN index is measured against"""
+    kind = 'exact'
+
+    def __init__(self, vectors: np.ndarray, ids: np.ndarray):
+        self.vectors = vectors
+        self.ids = ids
+
+    def __len__(self):
+        return len(self.ids)
+
+    @classmethod
+    def build(cls, vectors: np.ndarray, ids: np.ndarray, out_path: Optional[str] = None, **options) -> 'ExactIndex':
+        if out_path is not None:
+            return cls(_copy_rows(vectors, None, np.float32, out_path), np.asarray(ids, dtype=np.int64))
+        return cls(np.ascontiguousarray(vectors, dtype=np.float32), np.asarray(ids, dtype=np.int64))
+
+    def search(self, queries: np.ndarray, top_k: int = 5) -> Tuple[np.ndarray, np.ndarray]:
+        queries = np.atleast_2d(queries).astype(np.float32)
+        scores = np.concatenate([
+            queries @ np.asarray(self.vectors[start:start + BLOCK_ROWS], dtype=np.float32).T
+            for start in range(0, len(self), BLOCK_ROWS)
+        ], axis=1) if len(self) else np.empty((len(queries), 0), dtype=np.float32)
+        return _top_k(scores, self.ids, top_k)
+
+    def save(self, folder: str):
+        os.makedirs(folder, exist_ok=True)
+        _save_array(os.path.join(folder, 'vectors.npy'), self.vectors)
+        np.save(os.path.join(folder, 'ids.npy'), self.ids)
+        _write_meta(folder, {'kind': self.kind})
+
+    @classmethod
+    def load(cls, folder: str, meta: dict) -> 'ExactIndex':
+        return cls(
+            np.load(os.path.join(folder, 'vectors.npy'), mmap_mode='r'),
+            np.load(os.path.join(folder, 'ids.npy'), mmap_mode='r')
+        )
+
+class IVFIndex:
+    """Inverted file index over normalized vectors.
+
+    A spherical k-means coarse quantizer splits the vectors into nlist cells.
+    Vectors are stored grouped by cell (as float16 by default), so probing a
+    cell reads one contiguous slice of the memory-mapped file. A search scores
+    the nprobe closest cells exactly and returns the best top_k.
+    """
+    kind = 'ivf'
+
+    def __init__(self, centroids: np.ndarray, vectors: np.ndarray, ids: np.ndarray,
+                 offsets: np.ndarray, nprobe: int = 8):
+        self.centroids = centroids
+        self.vectors = vectors
+        self.ids = ids
+        self.offsets = offsets
+        self.nprobe = nprobe
+
+    def __len__(self):
+        return len(self.ids)
+
+    @classmethod
+    def build(cls, vectors: np.ndarray, ids: np.ndarray, nlist: Optional[int] = None, nprobe: int = 8,
+              iterations: int = 10, points_per_cell: int = 64, dtype: str = 'float16', seed: int = 0,
+              out_path: Optional[str] = None) -> 'IVFIndex':
+        """Cluster and regroup vectors by cell. With out_path the regrouped vectors
+        are written there as a .npy file a block at a time instead of held in memory"""
+        vectors = np.asarray(vectors, dtype=np.float32)
+        ids = np.asarray(ids, dtype=np.int64)
+        if nlist is None:
+            # Around 4 * sqrt(n) cells is the usual starting point
+            nlist = max(1, min(len(vectors), int(4 * math.sqrt(len(vectors)))))
+
+        centroids = _train_centroids(vectors, nlist, iterations, points_per_cell * nlist, seed)
+        assignments = _assign(vectors, centroids)
+
+        order = np.argsort(assignments, kind='stable')
+        counts = np.bincount(assignments, minlength=len(centroids))
+        offsets = np.concatenate([[0], np.cumsum(counts)]).astype(np.int64)
+        return cls(centroids, _copy_rows(vectors, order, dtype, out_path), ids[order], offsets, nprobe=nprobe)
+
+    def search(self, queries: np.ndarray, top_k: int = 5, nprobe: Optional[int] = None) -> Tuple[np.ndarray, np.ndarray]:
+        queries = np.atleast_2d(queries).astype(np.float32)
+        nprobe = min(nprobe or self.nprobe, len(self.centroids))
+
+        all_scores = np.full((len(queries), top_k), -np.inf, dtype=np.float32)
+        all_ids = np.full((len(queries), top_k), -1, dtype=np.int64)
+        cell_scores = queries @ self.centroids.T
+        probes = np.argpartition(-cell_scores, nprobe - 1, axis=1)[:, :nprobe]
+
+        for row, query in enumerate(queries):
+            candidate_scores = []
+            candidate_ids = []
+            for cell in probes[row]:
+                start, end = self.offsets[cell], self.offsets[cell + 1]
+                if start == end:
+                    continue
+                candidate_scores.append(np.asarray(self.vectors[start:end], dtype=np.float32) @ query)
+                candidate_ids.append(self.ids[start:end])
+            if not candidate_scores:
+                continue
+            scores, ids = _top_k(np.concatenate(candidate_scores)[None, :], np.concatenate(candidate_ids), top_k)
+            all_scores[row, :scores.shape[1]] = scores[0]
+            all_ids[row, :ids.shape[1]] = ids[0]
+        return all_scores, all_ids
+
+    def save(self, folder: str):
+        os.makedirs(folder, exist_ok=True)
+        np.save(os.path.join(folder, 'centroids.npy'), self.centroids)
+        _save_array(os.path.join(folder, 'vectors.npy'), self.vectors)
+        np.save(os.path.join(folder, 'ids.npy'), self.ids)
+        np.save(os.path.join(folder, 'offsets.npy'), self.offsets)
+        _write_meta(folder, {'kind': self.kind, 'nprobe': self.nprobe})
+
+    @classmethod
+    def load(cls, folder: str, meta: dict) -> 'IVFIndex':
+        # Centroids and offsets are small and read on every search, so load them fully
+        return cls(
+            np.load(os.path.join(folder, 'centroids.npy')),
+            np.load(os.path.join(folder, 'vectors.npy'), mmap_mode='r'),
+            np.load(os.path.join(folder, 'ids.npy'), mmap_mode='r'),
+            np.load(os.path.join(folder, 'offsets.npy')),
+            nprobe=meta.get('nprobe', 8)
+        )
+
+INDEX_TYPES = {
+    ExactIndex.kind: ExactIndex,
+    IVFIndex.kind: IVFIndex
+}
+
+def build_index(kind: str, vectors: np.ndarray, ids: np.ndarray, **options):
+    """Build an index of the given kind ('exact' or 'ivf') over normalized vectors"""
+    if kind not in INDEX_TYPES:
+        raise ValueError(f"Unknown index type '{kind}', expected one of {sorted(INDEX_TYPES)}")
+    return INDEX_TYPES[kind].build(vectors, ids, **options)
+
+def load_index(folder: str):
+    """Load an index saved with save(), memory-mapping its vectors"""
+    with open(os.path.join(folder, 'meta.json'), 'r', encoding='utf-8') as f:
+        meta = json.load(f)
+    return INDEX_TYPES[meta['kind']].load(folder, meta)
+
+def _write_meta(folder: str, meta: dict):
+    with open(os.path.join(folder, 'meta.json'), 'w', encoding='utf-8') as f:
+        json.dump(meta, f, indent=4)
+
+def _copy_rows(vectors: np.ndarray, order: Optional[np.ndarray], dtype, out_path: Optional[str]) -> np.ndarray:
+    """vectors[order] as dtype, copied BLOCK_ROWS at a time into a memory-mapped .npy at out_path if given"""
+    if out_path is None:
+        return (vectors if order is None else vectors[order]).astype(dtype)
+    out = np.lib.format.open_memmap(out_path, mode='w+', dtype=dtype, shape=vectors.shape)
+    for start in range(0, len(vectors), BLOCK_ROWS):
+        rows = slice(start, start + BLOCK_ROWS) if order is None else order[start:start + BLOCK_ROWS]
+        out[start:start + BLOCK_ROWS] = vectors[rows]
+    out.flush()
+    return out
+
+def _save_array(path: str, array: np.ndarray):
+    # Vectors built with out_path already live in this file
+    if isinstance(array, np.memmap) and array.filename and os.path.abspath(array.filename) == os.path.abspath(path):
+        array.flush()
+        return
+    np.save(path, array)
+
+def _top_k(scores: np.ndarray, ids: np.ndarray, top_k: int) -> Tuple[np.ndarray, np.ndarray]:
+    """Best top_k columns of each row of scores, sorted best first"""
+    top_k = min(top_k, scores.shape[1])
+    if top_k == 0:
+        return np.empty((len(scores), 0), dtype=np.float32), np.empty((len(scores), 0), dtype=np.int64)
+    part = np.argpartition(-scores, top_k - 1, axis=1)[:, :top_k]
+    part_scores = np.take_along_axis(scores, part, axis=1)
+    order = np.argsort(-part_scores, axis=1)
+    best = np.take_along_axis(part, order, axis=1)
+    return np.take_along_axis(scores, best, axis=1), np.asarray(ids)[best]
+
+def _normalize(vectors: np.ndarray) -> np.ndarray:
+    norms = np.linalg.norm(vectors, axis=1, keepdims=True)
+    return vectors / np.maximum(norms, 1e-12)
+
+def _assign(vectors: np.ndarray, centroids: np.ndarray) -> np.ndarray:
+    return np.concatenate([
+        np.argmax(vectors[start:start + BLOCK_ROWS] @ centroids.T, axis=1)
+        for start in range(0, len(vectors), BLOCK_ROWS)
+    ]) if len(vectors) else np.empty(0, dtype=np.int64)
+
+def _train_centroids(vectors: np.ndarray, nlist: int, iterations: int, sample_size: int, seed: int) -> np.ndarray:
+    """Spherical k-means on a random sample of the vectors"""
+    rng = np.random.default_rng(seed)
+    if len(vectors) > sample_size:
+        sample = vectors[rng.choice(len(vectors), sample_size, replace=False)]
+    else:
+        sample = vectors
+    centroids = sample[rng.choice(len(sample), nlist, replace=False)].copy()
+
+    for _ in range(iterations):
+        assignments = _assign(sample, centroids)
+        sums = np.zeros_like(centroids)
+        np.add.at(sums, assignments, sample)
+        counts = np.bincount(assignments, minlength=nlist)
+        # Reseed empty cells with random sample points
+        empty = counts == 0
+        if empty.any():
+            sums[empty] = sample[rng.choice(len(sample), int(empty.sum()), replace=False)]
+        centroids = _normalize(sums)
+    return centroids.astype(np.float32)
@@ -0,0 +1,110 @@
+import re
+import threading
+import time
+from collections import OrderedDict
+from typing import Dict, List, Optional, Tuple
+import torch
+
+class AnswerCache:
+    """In-memory cache of generated answers with TTL and LRU eviction.
+
+    Answers are grouped by (document id, retrieved chunk ids, prompt template,
+    model), so a hit always means the model would have seen the same context.
+    Within a group a question matches exactly on its normalized text, or,
+    with semantic lookup enabled, when its embedding is close enough to a
+    cached question's.
+    """
+    def __init__(self, max_entries: int = 10000, ttl_seconds: float = 24 * 3600,
+                 similarity_threshold: float = 0.95, semantic: bool = True):
+        self.max_entries = max_entries
+        self.ttl_seconds = ttl_seconds
+        self.similarity_threshold = similarity_threshold
+        self.semantic = semantic
+        # (group, normalized query) -> (answer, query embedding, expiry time)
+        self._entries: OrderedDict = OrderedDict()
+        self._groups: Dict[Tuple, set] = {}
+        self._lock = threading.Lock()
+        self._stats = {"exact_hits": 0, "semantic_hits": 0, "misses": 0, "evictions": 0, "expirations": 0}
+
+    @staticmethod
+    def _normalize(query: str) -> str:
+        return re.sub(r'\s+', ' ', query.strip().lower()).rstrip('?!. ')
+
+    @staticmethod
+    def _group(document_id: str, chunk_ids: List[int], template: str, model: str) -> Tuple:
+        return (document_id, tuple(sorted(chunk_ids)), template, model)
+
+    def _remove(self, key: Tuple):
+        self._entries.pop(key, None)
+        members = self._groups.get(key[0])
+        if members is not None:
+            members.discard(key)
+            if not members:
+                del self._groups[key[0]]
+
+    def get(self, document_id: str, chunk_ids: List[int], query: str, query_embedding: Optional[torch.Tensor] = None,
+            template: str = '', model: str = '') -> Optional[str]:
+        group = self._group(document_id, chunk_ids, template, model)
+        key = (group, self._normalize(query))
+        now = time.monotonic()
+
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                if entry[2] > now:
+                    self._entries.move_to_end(key)
+                    self._stats["exact_hits"] += 1
+                    return entry[0]
+                self._remove(key)
+                self._stats["expirations"] += 1
+
+            if self.semantic and query_embedding is not None:
+                query_embedding = query_embedding.detach().float().cpu()
+                best_key, best_score = None, self.similarity_threshold
+                for candidate in list(self._groups.get(group, ())):
+                    answer, embedding, expires_at = self._entries[candidate]
+                    if expires_at <= now:
+                        self._remove(candidate)
+                        self._stats["expirations"] += 1
+                        continue
+                    if embedding is None:
+                        continue
+                    score = float(torch.dot(query_embedding, embedding))
+                    if score >= best_score:
+                        best_key, best_score = candidate, score
+                if best_key is not None:
+                    self._entries.move_to_end(best_key)
+                    self._stats["semantic_hits"] += 1
+                    return self._entries[best_key][0]
+
+            self._stats["misses"] += 1
+            return None
+
+    def put(self, document_id: str, chunk_ids: List[int], query: str, answer: str,
+            query_embedding: Optional[torch.Tensor] = None, template: str = '', model: str = ''):
+        group = self._group(document_id, chunk_ids, template, model)
+        key = (group, self._normalize(query))
+        if query_embedding is not None:
+            query_embedding = query_embedding.detach().float().cpu()
+
+        with self._lock:
+            self._entries[key] = (answer, query_embedding, time.monotonic() + self.ttl_seconds)
+            self._entries.move_to_end(key)
+            self._groups.setdefault(group, set()).add(key)
+            while len(self._entries) > self.max_entries:
+                oldest = next(iter(self._entries))
+                self._remove(oldest)
+                self._stats["evictions"] += 1
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self._groups.clear()
+
+    def stats(self) -> Dict:
+        with self._lock:
+            stats = dict(self._stats)
+            stats["entries"] = len(self._entries)
+        lookups = stats["exact_hits"] + stats["semantic_hits"] + stats["misses"]
+        stats["hit_rate"] = (stats["exact_hits"] + stats["semantic_hits"]) / lookups if lookups else 0.0
+        return stats
@@ -1,6 +1,5 @@
-from flask import Flask, request, jsonify
+from flask import Flask, request, jsonify, Response, stream_with_context
 from flask_cors import CORS
-import pdfplumber
 import json
 import requests
 from bs4 import BeautifulSoup
@@ -9,8 +8,7 @@ from datetime import datetime
 from enum import Enum
 from dataclasses import dataclass, field
 from typing import List, Dict, Tuple, Optional
-from sentence_transformers import SentenceTransformer, util
-import ollama
+from sentence_transformers import SentenceTransformer
 import torch
 import nltk
 from nltk.tokenize import sent_tokenize
@@ -18,9 +16,34 @@ import concurrent.futures
 from urllib.parse import urlparse, urljoin
 import time
 import logging
-from werkzeug.utils import secure_filename
 import os
 import re
+import sys
+import tempfile
+import glob
+import hashlib
+import importlib.util
+import mmap
+import threading
+import shutil
+from collections import OrderedDict
+import numpy as np
+from disk_cache import DiskCache
+from pdf_extraction import extract_pages, iter_pages
+from retrieval import RetrievalEngine, EmbeddingMatrix, max_marginal_relevance
+from ann_index import build_index, load_index
+from chunking import chunk_text, chunks_to_dicts, page_windows, DEFAULT_OVERLAP_TOKENS
+from llm_gateway import gateway_from_env
+from answer_cache import AnswerCache
+from question_bank import QuestionBank, question_hash
+from competence_store import CompetenceStore
+from competence_bulk import bulk_competence
+from response_log import ResponseLog
+from host_limiter import HostLimiter
+from http_cache import HttpCache
+from complexity_classifier import ComplexityClassifier
+
+_startup_time = time.perf_counter()
 
 app = Flask(__name__)
 CORS(app)
@@ -29,97 +52,570 @@ UPLOAD_FOLDER = 'uploads'
 if not os.path.exists(UPLOAD_FOLDER):
     os.makedirs(UPLOAD_FOLDER)
 
-# Initialize the semantic search model
-print("Loading semantic search model...")
-retriever_model = SentenceTransformer('all-mpnet-base-v2')
-print("Semantic search model loaded successfully!")
-try:
-    nltk.data.find('tokenizers/punkt')
-except LookupError:
-    nltk.download('punkt')
+INDEX_FOLDER = os.path.join(UPLOAD_FOLDER, 'indexes')
+DOCUMENT_ID_PATTERN = re.compile(r'^[0-9a-f]{64}$')
+LIBRARY_FOLDER = os.path.join(UPLOAD_FOLDER, 'library')
+# 'ivf' for the approximate index, 'exact' for brute force
+LIBRARY_INDEX_TYPE = os.environ.get('ALIMER_LIBRARY_INDEX', 'ivf')
+EXTRACTION_CACHE_FOLDER = os.path.join(UPLOAD_FOLDER, 'cache', 'extracted')
+EXTRACTION_CACHE_MAX_BYTES = 512 * 1024 * 1024
+SUMMARY_CACHE_FOLDER = os.path.join(UPLOAD_FOLDER, 'cache', 'summaries')
+SUMMARY_CACHE_MAX_BYTES = 64 * 1024 * 1024
+MCQ_CACHE_FOLDER = os.path.join(UPLOAD_FOLDER, 'cache', 'mcqs')
+MCQ_CACHE_MAX_BYTES = 64 * 1024 * 1024
+COMPLEXITY_CACHE_FOLDER = os.path.join(UPLOAD_FOLDER, 'cache', 'complexity')
+COMPLEXITY_CACHE_MAX_BYTES = 16 * 1024 * 1024
+COMPLEXITY_MODEL_FOLDER = os.path.join(UPLOAD_FOLDER, 'complexity_model')
+# Local complexity predictions at least this confident skip the LLM;
+# ALIMER_COMPLEXITY_LOCAL=0 sends every page to the LLM as before
+COMPLEXITY_LOCAL_THRESHOLD = float(os.environ.get('ALIMER_COMPLEXITY_LOCAL_THRESHOLD', '0.8'))
+HTTP_CACHE_FOLDER = os.path.join(UPLOAD_FOLDER, 'cache', 'http')
+HTTP_CACHE_MAX_BYTES = 128 * 1024 * 1024
+# How long scraped pages that say nothing about caching are reused unchecked
+HTTP_CACHE_DEFAULT_TTL = float(os.environ.get('ALIMER_HTTP_CACHE_TTL', '3600'))
+COMPETENCE_DB_PATH = os.environ.get('ALIMER_COMPETENCE_DB', os.path.join(UPLOAD_FOLDER, 'competence.db'))
+
+LLM_MODEL = 'mistral'
+# Every model call goes through one pooled client with a bounded queue,
+# configured by OLLAMA_HOST and ALIMER_LLM_CONCURRENCY / _QUEUE / _TIMEOUT
+llm_gateway = gateway_from_env()
+MODEL_ERROR_ANSWER = "Sorry, I couldn't generate an answer due to a model error."
+NO_TEXT_SUMMARY = "No text could be extracted from the document."
+
+# Concurrent map requests sent to the Ollama server while summarizing
+SUMMARY_CONCURRENCY = 4
+# Partial summaries are reduced in groups until they fit in about this many characters
+SUMMARY_REDUCE_CHARS = 12000
+# Size of the windows summarized in the map step
+SUMMARY_WINDOW_TOKENS = 1024
+SUMMARY_REDUCE_PROMPT = "Combine the following partial summaries of one document into a single coherent summary:\n"
+# Concurrent answers generated for one /query/batch request
+QUERY_BATCH_CONCURRENCY = 4
+# Candidate pages fetched at once by /materials; each host still gets at most
+# SCRAPE_MAX_PER_HOST requests in flight, started SCRAPE_HOST_INTERVAL seconds apart
+SCRAPE_CONCURRENCY = int(os.environ.get('ALIMER_SCRAPE_CONCURRENCY', '8'))
+SCRAPE_MAX_PER_HOST = 1
+SCRAPE_HOST_INTERVAL = 1.0
+SCRAPE_TIMEOUT = 10
 
+RETRIEVER_MODEL_NAME = 'all-mpnet-base-v2'
 
-def extract_text_from_pdf(pdf_file):
+# The semantic search model is loaded on first use so that workers which never
+# need embeddings don't pay for it. Set ALIMER_PRELOAD_MODEL=1 (gunicorn.conf.py
+# does) to load it at import instead, so a preloading master can fork workers
+# that share the weights copy-on-write. That only applies on CPU: CUDA can't be
+# re-initialized in a forked child, so on a GPU the model is still loaded
+# lazily in each worker. ALIMER_EMBEDDING_STORAGE selects how
+# chunk embeddings are kept in memory: float32, float16 or int8.
+retrieval_engine = RetrievalEngine(RETRIEVER_MODEL_NAME, storage=os.environ.get('ALIMER_EMBEDDING_STORAGE'))
+_punkt_ready = False
+
+def get_retriever_model() -> SentenceTransformer:
+    return retrieval_engine.model
+
+def ensure_punkt():
+    """Download the NLTK sentence tokenizer the first time it is needed"""
+    global _punkt_ready
+    if _punkt_ready:
+        return
     try:
-        extracted_text = []
-        with pdfplumber.open(pdf_file) as pdf:
-            for page_num, page in enumerate(pdf.pages):
-                text = page.extract_text()
-                if text:
-                    extracted_text.append({
-                        "page": page_num + 1,
-                        "text": text.strip()
-                    })
-        return extracted_text
+        nltk.data.find('tokenizers/punkt')
+    except LookupError:
+        nltk.download('punkt')
+    _punkt_ready = True
+
+def current_rss_mb() -> Optional[float]:
+    """Resident set size of this process in MB, if the platform exposes it"""
+    try:
+        with open('/proc/self/status') as f:
+            for line in f:
+                if line.startswith('VmRSS:'):
+                    return int(line.split()[1]) / 1024
+    except OSError:
+        pass
+    try:
+        import resource
+        # Peak rather than current RSS, reported in KB on Linux and bytes on macOS
+        peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        return peak / (1024 * 1024) if sys.platform == 'darwin' else peak / 1024
+    except ImportError:
+        return None
+
+def report_startup(label: str = "Server"):
+    rss = current_rss_mb()
+    rss_text = f"{rss:.0f} MB" if rss is not None else "unknown"
+    print(f"{label} ready (pid {os.getpid()}) after {time.perf_counter() - _startup_time:.1f}s, RSS {rss_text}")
+
+if os.environ.get('ALIMER_PRELOAD_MODEL') == '1':
+    if retrieval_engine.device == 'cpu':
+        get_retriever_model()
+    else:
+        print(f"Not preloading the semantic search model on {retrieval_engine.device}, each worker loads its own")
+    ensure_punkt()
+
+
+def extract_text_from_pdf(pdf_file, parallel=None):
+    try:
+        # Large PDFs are split across a process pool, small ones stay serial
+        return extract_pages(pdf_file, parallel=parallel)
     except Exception as e:
         print(f"Error reading the PDF: {e}")
         return []
 
-def chunk_text(text_data, chunk_size=500, overlap=100):
-    chunks = []
-    for entry in text_data:
-        words = entry["text"].split()
-        for i in range(0, len(words), chunk_size - overlap):
-            chunk = " ".join(words[i:i + chunk_size])
-            chunks.append({
-                "page": entry["page"],
-                "text": chunk
-            })
-    return chunks
+# Partial and final summaries keyed by a hash of the prompt, so re-summarizing
+# an edited document only regenerates the chunks that changed
+summary_cache = DiskCache(SUMMARY_CACHE_FOLDER, max_bytes=SUMMARY_CACHE_MAX_BYTES)
+
+# Extracted pages keyed by the hash of the PDF bytes, same shape as extracted_text.json
+extraction_cache = DiskCache(EXTRACTION_CACHE_FOLDER, max_bytes=EXTRACTION_CACHE_MAX_BYTES)
+
+def chunk_document(text_data, max_tokens=None, overlap_tokens=DEFAULT_OVERLAP_TOKENS):
+    """Token-aware chunks sized for the retrieval model unless max_tokens says otherwise"""
+    return chunk_text(
+        text_data,
+        tokenizer=retrieval_engine.tokenizer,
+        max_tokens=max_tokens or retrieval_engine.max_tokens,
+        overlap_tokens=overlap_tokens
+    )
+
+def summary_prompt(text_chunks):
+    """Map-reduce up to the final summary prompt: summarize each chunk window
+    concurrently, then combine the partial summaries until they fit the model
+    context. Returns (prompt, None), or (None, answer) when there is nothing
+    to send: no text, or every map step or a reduce step failed"""
+    # Page-anchored windows, so an edited page only invalidates the cached
+    # map summaries of its own window
+    windows = [window["text"] for window in page_windows(
+        text_chunks, tokenizer=retrieval_engine.tokenizer, max_tokens=SUMMARY_WINDOW_TOKENS
+    )]
+    if not windows:
+        return None, NO_TEXT_SUMMARY
+    if len(windows) == 1:
+        return f"Summarize the following text:\n{windows[0]}", None
+
+    with concurrent.futures.ThreadPoolExecutor(max_workers=SUMMARY_CONCURRENCY) as executor:
+        summaries = list(executor.map(
+            lambda window: generate_cached_answer(f"Summarize the following text:\n{window}"),
+            windows
+        ))
+        # A failed window is left out rather than combined as if the error
+        # message were its summary
+        summaries = [summary for summary in summaries if summary != MODEL_ERROR_ANSWER]
+        if not summaries:
+            return None, MODEL_ERROR_ANSWER
+
+        # Reduce in groups until the partial summaries fit into one prompt
+        while len("\n\n".join(summaries)) > SUMMARY_REDUCE_CHARS and len(summaries) > 2:
+            # Every group but the last takes at least two summaries, so each pass shrinks the list
+            groups = [[]]
+            for summary in summaries:
+                group = groups[-1]
+                if len(group) >= 2 and sum(len(s) for s in group) + len(summary) > SUMMARY_REDUCE_CHARS:
+                    groups.append([summary])
+                else:
+                    group.append(summary)
+            summaries = list(executor.map(
+                lambda group: generate_cached_answer(SUMMARY_REDUCE_PROMPT + "\n\n".join(group)),
+                groups
+            ))
+            # A failed reduce would drop several windows at once, so give up instead
+            if MODEL_ERROR_ANSWER in summaries:
+                return None, MODEL_ERROR_ANSWER
+
+    return SUMMARY_REDUCE_PROMPT + "\n\n".join(summaries), None
 
 def generate_summary(text_chunks):
+    prompt, answer = summary_prompt(text_chunks)
+    if prompt is None:
+        return answer
+    return generate_cached_answer(prompt)
 
-    # Combine all text chunks into a single string for summarization
-    full_text = " ".join(chunk["text"] for chunk in text_chunks)
+def stream_summary(text_chunks):
+    """Like generate_summary, but streams the tokens of the final combine step"""
+    prompt, answer = summary_prompt(text_chunks)
+    if prompt is None:
+        yield answer
+    else:
+        yield from stream_cached_answer(prompt)
 
-    prompt = f"Summarize the following text:\n{full_text}"  
+def answer_cache_key(prompt):
+    return hashlib.sha256(f"{LLM_MODEL}\n{prompt}".encode('utf-8')).hexdigest()
 
-    # Generate summary using the Ollama model
-    summary = generate_answer(prompt)
-    return summary
+def generate_cached_answer(prompt):
+    """generate_answer, cached on disk by a hash of the model and prompt"""
+    key = answer_cache_key(prompt)
+    cached = summary_cache.get(key)
+    if cached is not None:
+        return cached["answer"]
 
-def retrieve_relevant_context(query, text_chunks, top_k=5):
-    device = 'cuda' if torch.cuda.is_available() else 'cpu'
-    retriever_model.to(device)
-    
-    query_embedding = retriever_model.encode(query, convert_to_tensor=True).to(device)
-    chunk_texts = [chunk["text"] for chunk in text_chunks]
-    chunk_embeddings = retriever_model.encode(chunk_texts, convert_to_tensor=True).to(device)
-    
-    scores = util.pytorch_cos_sim(query_embedding, chunk_embeddings)[0]
-    top_k = min(top_k, len(scores))
-    
-    if top_k == 0:
-        return []
-    
-    top_results = scores.topk(k=top_k)
-    relevant_chunks = [text_chunks[idx] for idx in top_results.indices]
-    return relevant_chunks
+    answer = generate_answer(prompt)
+    # Never cache a failure, so the next upload asks the model again
+    if answer and answer != MODEL_ERROR_ANSWER:
+        summary_cache.set(key, {"answer": answer})
+    return answer
+
+def stream_cached_answer(prompt):
+    """stream_answer backed by the same cache as generate_cached_answer"""
+    key = answer_cache_key(prompt)
+    cached = summary_cache.get(key)
+    if cached is not None:
+        yield cached["answer"]
+        return
+
+    pieces = []
+    status = {}
+    for token in stream_answer(prompt, status):
+        pieces.append(token)
+        yield token
+    # Only a stream that ran to the end is cached, never a partial answer
+    # followed by the error message
+    answer = "".join(pieces).strip()
+    if answer and status.get("complete"):
+        summary_cache.set(key, {"answer": answer})
+
+def compute_document_id(data: bytes) -> str:
+    """Content hash used to identify an uploaded document"""
+    return hashlib.sha256(data).hexdigest()
+
+@dataclass
+class DocumentIndex:
+    document_id: str
+    chunks: List[Dict]
+    matrix: EmbeddingMatrix
+
+class DocumentIndexStore:
+    """Chunk embeddings per document, kept in memory and persisted to disk.
+
+    The chunks of a document are encoded once when it is uploaded so that
+    later queries only need to encode the question itself. Only uploaded
+    documents are written to disk; indexes of text posted with a query live
+    in the in-memory LRU alone, so clients can't grow the folder.
+    """
+    def __init__(self, folder: str, max_in_memory: int = 32):
+        self.folder = folder
+        self.max_in_memory = max_in_memory
+        self._indexes: OrderedDict = OrderedDict()
+        self._lock = threading.Lock()
+        os.makedirs(folder, exist_ok=True)
+
+    def _path(self, document_id: str) -> str:
+        if not DOCUMENT_ID_PATTERN.match(document_id):
+            raise ValueError(f"Invalid document id: {document_id}")
+        return os.path.join(self.folder, f"{document_id}.pt")
+
+    def _remember(self, index: DocumentIndex):
+        with self._lock:
+            self._indexes[index.document_id] = index
+            self._indexes.move_to_end(index.document_id)
+            while len(self._indexes) > self.max_in_memory:
+                self._indexes.popitem(last=False)
+
+    def build(self, document_id: str, extracted_text: List[Dict], persist: bool = True) -> DocumentIndex:
+        """Chunk and encode a document, then keep the result under its id, on disk too if persist"""
+        chunks = chunk_document(extracted_text)
+        if not chunks:
+            # Nothing is kept for an empty extraction, so a later upload that
+            # does extract text gets indexed instead of answering "no context"
+            return DocumentIndex(document_id=document_id, chunks=[], matrix=retrieval_engine.prepare(torch.empty(0)))
+
+        embeddings = retrieval_engine.encode([chunk.text for chunk in chunks]).cpu()
+        if persist:
+            # Full precision goes to disk, the resident copy uses the engine's storage dtype
+            torch.save({"chunks": chunks_to_dicts(chunks), "embeddings": embeddings}, self._path(document_id))
+        index = DocumentIndex(document_id=document_id, chunks=chunks, matrix=retrieval_engine.prepare(embeddings))
+        self._remember(index)
+        return index
+
+    def get(self, document_id: str) -> Optional[DocumentIndex]:
+        """Return the index for a document from memory or disk, if it exists"""
+        if not DOCUMENT_ID_PATTERN.match(document_id or ''):
+            return None
+        with self._lock:
+            index = self._indexes.get(document_id)
+            if index is not None:
+                self._indexes.move_to_end(document_id)
+                return index
+
+        path = self._path(document_id)
+        if not os.path.exists(path):
+            return None
+        try:
+            data = torch.load(path, map_location='cpu')
+        except Exception as e:
+            print(f"Error loading document index {document_id}: {e}")
+            return None
+        if not data["chunks"]:
+            # Saved from an empty extraction by an earlier version; rebuild on the next upload
+            return None
+        index = DocumentIndex(document_id=document_id, chunks=data["chunks"], matrix=retrieval_engine.prepare(data["embeddings"]))
+        self._remember(index)
+        return index
+
+    def get_or_build(self, document_id: str, extracted_text: List[Dict], persist: bool = True) -> DocumentIndex:
+        return self.get(document_id) or self.build(document_id, extracted_text, persist=persist)
+
+    def register_upload(self, document_id: str):
+        """Mark an index as an uploaded course document, which the course library is built from"""
+        self._path(document_id)
+        os.makedirs(os.path.join(self.folder, 'uploaded'), exist_ok=True)
+        open(os.path.join(self.folder, 'uploaded', document_id), 'a').close()
+
+    def uploaded_ids(self) -> List[str]:
+        folder = os.path.join(self.folder, 'uploaded')
+        if not os.path.isdir(folder):
+            return []
+        return sorted(name for name in os.listdir(folder) if DOCUMENT_ID_PATTERN.match(name))
+
+document_indexes = DocumentIndexStore(INDEX_FOLDER)
+
+def process_alive(pid) -> bool:
+    """Whether a process with this id is still running on this machine"""
+    if not isinstance(pid, int) or pid <= 0:
+        return False
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        return True
+    except OSError:
+        return False
+    return True
+
+class CourseLibrary:
+    """Nearest neighbour index over the chunks of every indexed document.
+
+    The index is built from the indexes of uploaded documents only, and saved
+    under LIBRARY_FOLDER next to the text of every chunk (chunks.jsonl, with
+    the byte offset of each line in chunk_offsets.npy). Searches memory-map
+    both and never load a document index. Builds stream one document at a
+    time into a staging folder, so memory stays bounded by the largest document.
+
+    Building takes long on a large library, so it runs offline
+    (python build_library.py) or on a background thread started by
+    POST /library/build. Its progress is kept in a status file next to the
+    library so that every server worker can report it.
+    """
+    def __init__(self, folder: str, kind: str):
+        self.folder = folder
+        self.kind = kind
+        self.status_path = f"{folder}.status.json"
+        self._library = None
+        self._lock = threading.Lock()
+        self._build_lock = threading.Lock()
+
+    def _write_status(self, status: Dict):
+        temp_path = f"{self.status_path}.{os.getpid()}.{threading.get_ident()}.tmp"
+        with open(temp_path, 'w', encoding='utf-8') as f:
+            json.dump(status, f)
+        os.replace(temp_path, self.status_path)
+
+    def status(self) -> Dict:
+        """State of the last build: idle, running, done (with its result) or failed (with the error)"""
+        try:
+            with open(self.status_path, 'r', encoding='utf-8') as f:
+                status = json.load(f)
+        except (OSError, ValueError):
+            return {"state": "idle"}
+        if status.get("state") == "running" and not process_alive(status.get("pid")):
+            status.update(state="failed", error="The build process exited before finishing")
+        return status
+
+    def start_build(self, **options) -> bool:
+        """Rebuild on a background thread; False if a build is already running"""
+        if self.status().get("state") == "running" or self._build_lock.locked():
+            return False
+
+        def run():
+            try:
+                self.build(**options)
+            except Exception as e:
+                print(f"Error building the course library: {e}")
+
+        # Written here as well, so a status check right after starting already sees it
+        self._write_status({"state": "running", "pid": os.getpid(), "started": time.time()})
+        threading.Thread(target=run, name="library-build", daemon=True).start()
+        return True
+
+    def build(self, **options) -> Dict:
+        """Rebuild the library index from every uploaded document, recording its status"""
+        # One rebuild at a time in this process
+        with self._build_lock:
+            started = time.time()
+            self._write_status({"state": "running", "pid": os.getpid(), "started": started})
+            try:
+                result = self._build(**options)
+            except Exception as e:
+                self._write_status({"state": "failed", "pid": os.getpid(), "started": started,
+                                    "finished": time.time(), "error": str(e)})
+                raise
+            self._write_status({"state": "done", "pid": os.getpid(), "started": started,
+                                "finished": time.time(), "result": result})
+            return result
+
+    def _build(self, **options) -> Dict:
+        # Staging folders are per process; ones left behind by builds that died are removed
+        for path in glob.glob(f"{self.folder}.building.*"):
+            pid = path.rsplit('.', 1)[-1]
+            if pid.isdigit() and not process_alive(int(pid)):
+                shutil.rmtree(path, ignore_errors=True)
+        staging = f"{self.folder}.building.{os.getpid()}"
+        shutil.rmtree(staging, ignore_errors=True)
+        os.makedirs(staging)
+        source_path = os.path.join(staging, 'source_vectors.f32')
+
+        try:
+            offsets, documents, dimension = [0], 0, None
+            with open(source_path, 'wb') as vectors_file, open(os.path.join(staging, 'chunks.jsonl'), 'wb') as chunks_file:
+                for document_id in document_indexes.uploaded_ids():
+                    path = os.path.join(document_indexes.folder, f"{document_id}.pt")
+                    if not os.path.exists(path):
+                        continue
+                    data = torch.load(path, map_location='cpu')
+                    embeddings = data["embeddings"]
+                    if embeddings.nelement() == 0:
+                        continue
+                    embeddings = torch.nn.functional.normalize(embeddings.float(), dim=1).numpy()
+                    dimension = embeddings.shape[1]
+                    vectors_file.write(np.ascontiguousarray(embeddings, dtype=np.float32).tobytes())
+                    for chunk in data["chunks"]:
+                        line = json.dumps({"documentId": document_id, "page": chunk["page"], "text": chunk["text"]}).encode('utf-8') + b'\n'
+                        chunks_file.write(line)
+                        offsets.append(offsets[-1] + len(line))
+                    documents += 1
+                    del data, embeddings
+
+            chunks = len(offsets) - 1
+            if not chunks:
+                raise ValueError("No uploaded documents to build the library from")
+
+            vectors = np.memmap(source_path, dtype=np.float32, mode='r', shape=(chunks, dimension))
+            index = build_index(self.kind, vectors, np.arange(chunks, dtype=np.int64),
+                                out_path=os.path.join(staging, 'vectors.npy'), **options)
+            index.save(staging)
+            np.save(os.path.join(staging, 'chunk_offsets.npy'), np.asarray(offsets, dtype=np.int64))
+            del index, vectors
+            os.remove(source_path)
+
+            # Searches hold on to the library they loaded, so the swap can't mix old and new files
+            with self._lock:
+                shutil.rmtree(self.folder, ignore_errors=True)
+                os.replace(staging, self.folder)
+                self._library = None
+        finally:
+            shutil.rmtree(staging, ignore_errors=True)
+
+        return {"documents": documents, "chunks": chunks, "index": self.kind}
+
+    def _load(self):
+        """The loaded (index, chunk offsets, chunk text) of the current build, or None"""
+        with self._lock:
+            if self._library is None:
+                if not os.path.exists(os.path.join(self.folder, 'chunk_offsets.npy')):
+                    return None
+                index = load_index(self.folder)
+                offsets = np.load(os.path.join(self.folder, 'chunk_offsets.npy'), mmap_mode='r')
+                with open(os.path.join(self.folder, 'chunks.jsonl'), 'rb') as f:
+                    text = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+                self._library = (index, offsets, text)
+            return self._library
+
+    def search(self, query: str, top_k: int = 5) -> Optional[List[Dict]]:
+        """Best matching chunks across the library, or None if it hasn't been built"""
+        library = self._load()
+        if library is None:
+            return None
+        index, offsets, text = library
+
+        query_embedding = retrieval_engine.encode([query]).float().cpu().numpy()
+        scores, ids = index.search(query_embedding, top_k=top_k)
+
+        results = []
+        for score, chunk_id in zip(scores[0].tolist(), ids[0].tolist()):
+            if chunk_id < 0:
+                continue
+            chunk = json.loads(text[int(offsets[chunk_id]):int(offsets[chunk_id + 1])])
+            results.append({
+                "documentId": chunk["documentId"],
+                "page": chunk["page"],
+                "text": chunk["text"],
+                "score": round(score, 4)
+            })
+        return results
+
+course_library = CourseLibrary(LIBRARY_FOLDER, LIBRARY_INDEX_TYPE)
+
+ANSWER_OPTIONS = {
+    'temperature': 0.7,
+    'top_p': 0.9,
+    'max_tokens': 500
+}
+
+def answer_messages(prompt):
+    return [
+        {
+            'role': 'system',
+            'content': 'You are a helpful assistant that answers questions based strictly on the provided context in a detailed summary. If the information is not in the context, say you do not know.'
+        },
+        {
+            'role': 'user',
+            'content': prompt
+        }
+    ]
 
 def generate_answer(prompt):
     try:
-        response = ollama.chat(
-            model='mistral',
-            messages=[
-                {
-                    'role': 'system',
-                    'content': 'You are a helpful assistant that answers questions based strictly on the provided context in a detailed summary. If the information is not in the context, say you do not know.'
-                },
-                {
-                    'role': 'user',
-                    'content': prompt
-                }
-            ],
-            options={
-                'temperature': 0.7,
-                'top_p': 0.9,
-                'max_tokens': 500
-            }
+        response = llm_gateway.chat(
+            model=LLM_MODEL,
+            messages=answer_messages(prompt),
+            options=ANSWER_OPTIONS
         )
         return response['message']['content'].strip()
     except Exception as e:
         print(f"Error generating answer: {e}")
-        return "Sorry, I couldn't generate an answer due to a model error."
+        return MODEL_ERROR_ANSWER
+
+def stream_answer(prompt, status: Optional[Dict] = None):
+    """Yield the answer token by token as the model produces it.
+
+    If the model fails the error message is yielded after whatever was
+    already sent; status["complete"] is set only when the answer finished
+    cleanly, so callers can tell the two apart before caching.
+    """
+    try:
+        yield from llm_gateway.stream_chat(
+            model=LLM_MODEL,
+            messages=answer_messages(prompt),
+            options=ANSWER_OPTIONS
+        )
+    except Exception as e:
+        print(f"Error generating answer: {e}")
+        yield MODEL_ERROR_ANSWER
+        return
+    if status is not None:
+        status["complete"] = True
+
+def sse_event(event, data):
+    """Format one server-sent event with a JSON payload"""
+    return f"event: {event}\ndata: {json.dumps(data)}\n\n"
+
+def stream_events(tokens, done, prelude=()):
+    """SSE response with any (event, data) prelude pairs, each token as it
+    arrives, then a done event built from the full text"""
+    def generate():
+        for event, data in prelude:
+            yield sse_event(event, data)
+        pieces = []
+        for token in tokens:
+            pieces.append(token)
+            yield sse_event('token', {'token': token})
+        yield sse_event('done', done("".join(pieces).strip()))
+
+    return Response(
+        stream_with_context(generate()),
+        mimetype='text/event-stream',
+        headers={'Cache-Control': 'no-cache', 'X-Accel-Buffering': 'no'}
+    )
 
 @app.route('/extract-text', methods=['POST'])
 def extract_text():
@@ -131,17 +627,43 @@ def extract_text():
         return jsonify({'error': 'No file selected'}), 400
     
     try:
-        filename = secure_filename(file.filename)
-        filepath = os.path.join(UPLOAD_FOLDER, filename)
-        file.save(filepath)
+        file_bytes = file.read()
+        document_id = compute_document_id(file_bytes)
 
-        extracted_text = extract_text_from_pdf(filepath)
-        os.remove(filepath)  # Clean up the uploaded file
+        # Skip pdfplumber entirely if these exact bytes were seen before
+        extracted_text = extraction_cache.get(document_id)
+        if extracted_text is None:
+            # A unique temporary file, so concurrent uploads with the same name
+            # or the same bytes never overwrite or delete each other's copy
+            fd, filepath = tempfile.mkstemp(dir=UPLOAD_FOLDER, suffix='.pdf')
+            try:
+                with os.fdopen(fd, 'wb') as f:
+                    f.write(file_bytes)
+                extracted_text = extract_text_from_pdf(filepath)
+            finally:
+                os.remove(filepath)  # Clean up the uploaded file
+
+            if extracted_text:
+                extraction_cache.set(document_id, extracted_text)
+
+        # Encode the chunks once so later queries only encode the question
+        document_indexes.get_or_build(document_id, extracted_text)
+        if extracted_text:
+            document_indexes.register_upload(document_id)
+
+        # Optionally stream the summary tokens as server-sent events
+        if request.values.get('stream', '').lower() in ('1', 'true', 'yes'):
+            return stream_events(
+                stream_summary(extracted_text),
+                lambda summary: {'summary': summary, 'text_length': len(summary.split())},
+                prelude=[('document', {'documentId': document_id, 'extractedText': extracted_text})]
+            )
 
         # Generate summary from the extracted text
         summary = generate_summary(extracted_text)
         length = len(summary.split())
         return jsonify({
+            'documentId': document_id,
             'extractedText': extracted_text,
             'summary': summary,
             'text_length': length
@@ -149,29 +671,251 @@ def extract_text():
     except Exception as e:
         return jsonify({'error': str(e)}), 500
 
+@app.route('/extract-text/stream', methods=['POST'])
+def extract_text_stream():
+    """Stream the extraction as NDJSON: the document id, each page as soon as
+    it is extracted, and finally the summary"""
+    if 'pdf' not in request.files:
+        return jsonify({'error': 'No PDF file provided'}), 400
+    
+    file = request.files['pdf']
+    if file.filename == '':
+        return jsonify({'error': 'No file selected'}), 400
+
+    file_bytes = file.read()
+    document_id = compute_document_id(file_bytes)
+
+    def generate():
+        yield json.dumps({'type': 'document', 'documentId': document_id}) + '\n'
+
+        filepath = None
+        try:
+            extracted_text = extraction_cache.get(document_id)
+            if extracted_text is None:
+                # Unique per request: two uploads of the same PDF would otherwise
+                # truncate and delete the file while the other is still reading it
+                fd, filepath = tempfile.mkstemp(dir=UPLOAD_FOLDER, suffix='.pdf')
+                with os.fdopen(fd, 'wb') as f:
+                    f.write(file_bytes)
+
+                extracted_text = []
+                for entry in iter_pages(filepath):
+                    extracted_text.append(entry)
+                    yield json.dumps({'type': 'page', **entry}) + '\n'
+
+                if extracted_text:
+                    extraction_cache.set(document_id, extracted_text)
+            else:
+                for entry in extracted_text:
+                    yield json.dumps({'type': 'page', **entry}) + '\n'
+
+            document_indexes.get_or_build(document_id, extracted_text)
+            if extracted_text:
+                document_indexes.register_upload(document_id)
+
+            summary = generate_summary(extracted_text)
+            yield json.dumps({
+                'type': 'summary',
+                'summary': summary,
+                'text_length': len(summary.split())
+            }) + '\n'
+        except Exception as e:
+            yield json.dumps({'type': 'error', 'error': str(e)}) + '\n'
+        finally:
+            if filepath and os.path.exists(filepath):
+                os.remove(filepath)
+
+    return Response(stream_with_context(generate()), mimetype='application/x-ndjson')
+
+@app.route('/extract-text/cache', methods=['GET'])
+def extraction_cache_stats():
+    return jsonify(extraction_cache.stats())
+
+@app.route('/extract-text/cache', methods=['DELETE'])
+@app.route('/extract-text/cache/<document_id>', methods=['DELETE'])
+def purge_extraction_cache(document_id=None):
+    try:
+        removed = extraction_cache.purge(document_id)
+        return jsonify({'removed': removed})
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+
+NO_CONTEXT_ANSWER = "I couldn't find any relevant information in the document."
+
+def resolve_document_index(data) -> Optional[DocumentIndex]:
+    """Look up the precomputed index for a request, building it from extractedText if needed"""
+    document_id = data.get('documentId')
+    index = document_indexes.get(document_id) if document_id else None
+    if index is None:
+        text_chunks = data.get('extractedText', [])
+        if not text_chunks:
+            return None
+        document_id = compute_document_id(json.dumps(text_chunks, sort_keys=True).encode('utf-8'))
+        # Posted text is only indexed in memory; uploads are what get persisted
+        index = document_indexes.get_or_build(document_id, text_chunks, persist=False)
+    return index
+
+ANSWER_PROMPT_TEMPLATE = "Context: {context}\nQuestion: {query}\nProvide a detailed answer based only on the given context:"
+
+# Repeated questions on the same document and context skip generation.
+# ALIMER_ANSWER_CACHE_SEMANTIC=0 restricts hits to the same normalized question
+answer_cache = AnswerCache(
+    max_entries=int(os.environ.get('ALIMER_ANSWER_CACHE_SIZE', '10000')),
+    ttl_seconds=float(os.environ.get('ALIMER_ANSWER_CACHE_TTL', str(24 * 3600))),
+    similarity_threshold=float(os.environ.get('ALIMER_ANSWER_CACHE_SIMILARITY', '0.95')),
+    semantic=os.environ.get('ALIMER_ANSWER_CACHE_SEMANTIC', '1') == '1'
+)
+
+def build_answer_prompt(query, relevant_chunks):
+    context = " ".join([chunk["text"] for chunk in relevant_chunks])
+    return ANSWER_PROMPT_TEMPLATE.format(context=context, query=query)
+
+def cached_answer(index, query, query_embedding, chunk_ids):
+    return answer_cache.get(index.document_id, chunk_ids, query, query_embedding,
+                            template=ANSWER_PROMPT_TEMPLATE, model=LLM_MODEL)
+
+def remember_answer(index, query, query_embedding, chunk_ids, answer):
+    if answer and answer != MODEL_ERROR_ANSWER:
+        answer_cache.put(index.document_id, chunk_ids, query, answer, query_embedding,
+                         template=ANSWER_PROMPT_TEMPLATE, model=LLM_MODEL)
+
+def answer_from_index(index, query, query_embedding, chunk_ids):
+    """Answer from the given chunks of a document, going through the answer cache"""
+    if not chunk_ids:
+        return NO_CONTEXT_ANSWER
+    answer = cached_answer(index, query, query_embedding, chunk_ids)
+    if answer is None:
+        answer = generate_answer(build_answer_prompt(query, [index.chunks[idx] for idx in chunk_ids]))
+        remember_answer(index, query, query_embedding, chunk_ids, answer)
+    return answer
+
 @app.route('/query', methods=['POST'])
 def process_query():
     try:
         data = request.json
         query = data.get('query')
-        text_chunks = data.get('extractedText', [])
         
-        if not query or not text_chunks:
+        if not query or not (data.get('documentId') or data.get('extractedText')):
             return jsonify({'error': 'Missing query or text data'}), 400
         
-        # Chunk the text and retrieve relevant context
-        chunks = chunk_text(text_chunks)
-        relevant_chunks = retrieve_relevant_context(query, chunks)
+        index = resolve_document_index(data)
+        if index is None:
+            return jsonify({'error': 'Unknown document, please upload it again'}), 404
         
-        if not relevant_chunks:
-            return jsonify({'answer': "I couldn't find any relevant information in the document."})
+        query_embedding = retrieval_engine.encode([query])
+        _, indices = retrieval_engine.search(query_embedding, index.matrix, top_k=5)
+        chunk_ids = indices[0].tolist()
+        
+        # Optionally stream the answer tokens as server-sent events
+        if data.get('stream'):
+            answer = NO_CONTEXT_ANSWER if not chunk_ids else cached_answer(index, query, query_embedding[0], chunk_ids)
+            status = {}
+            if answer is not None:
+                tokens = iter([answer])
+            else:
+                tokens = stream_answer(build_answer_prompt(query, [index.chunks[idx] for idx in chunk_ids]), status)
+            
+            def done(answer):
+                # A stream that failed partway ends with the error message; never cache that
+                if status.get("complete"):
+                    remember_answer(index, query, query_embedding[0], chunk_ids, answer)
+                return {'answer': answer, 'documentId': index.document_id}
+            
+            return stream_events(tokens, done)
         
         # Generate answer using the relevant context
-        context = " ".join([chunk["text"] for chunk in relevant_chunks])
-        prompt = f"Context: {context}\nQuestion: {query}\nProvide a detailed answer based only on the given context:"
-        answer = generate_answer(prompt)
+        answer = answer_from_index(index, query, query_embedding[0], chunk_ids)
+        
+        return jsonify({'answer': answer, 'documentId': index.document_id})
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
+
+def is_positive_int(value) -> bool:
+    # JSON true/false arrive as bools, which are ints to Python
+    return isinstance(value, int) and not isinstance(value, bool) and value > 0
+
+@app.route('/query/batch', methods=['POST'])
+def process_query_batch():
+    """Answer several questions about one document, encoding them in one batch"""
+    try:
+        data = request.json
+        queries = data.get('queries', [])
+        top_k = data.get('top_k', 5)
+        
+        if not isinstance(queries, list) or not queries or not all(isinstance(q, str) and q.strip() for q in queries):
+            return jsonify({'error': 'queries must be a non-empty list of questions'}), 400
+        if not is_positive_int(top_k):
+            return jsonify({'error': 'top_k must be a positive integer'}), 400
+        if not (data.get('documentId') or data.get('extractedText')):
+            return jsonify({'error': 'Missing query or text data'}), 400
+        
+        index = resolve_document_index(data)
+        if index is None:
+            return jsonify({'error': 'Unknown document, please upload it again'}), 404
+        
+        # One encode for all questions and one similarity matrix against the chunks
+        query_embeddings = retrieval_engine.encode(queries)
+        _, indices = retrieval_engine.search(query_embeddings, index.matrix, top_k=top_k)
+        
+        def answer(position):
+            return answer_from_index(index, queries[position], query_embeddings[position], indices[position].tolist())
+        
+        with concurrent.futures.ThreadPoolExecutor(max_workers=QUERY_BATCH_CONCURRENCY) as executor:
+            answers = list(executor.map(answer, range(len(queries))))
+        
+        return jsonify({
+            'documentId': index.document_id,
+            'answers': [
+                {'query': query, 'answer': answer} for query, answer in zip(queries, answers)
+            ]
+        })
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
+
+@app.route('/metrics/llm', methods=['GET'])
+def llm_metrics():
+    return jsonify(llm_gateway.stats())
+
+@app.route('/metrics/answer-cache', methods=['GET'])
+def answer_cache_metrics():
+    return jsonify(answer_cache.stats())
+
+@app.route('/metrics/question-bank', methods=['GET'])
+def question_bank_metrics():
+    return jsonify(question_bank.stats())
+
+@app.route('/library/build', methods=['POST'])
+def build_library():
+    """Start rebuilding the library in the background; poll GET /library/build for the result"""
+    if not course_library.start_build():
+        return jsonify({'error': 'A library build is already running', **course_library.status()}), 409
+    return jsonify({'state': 'running'}), 202
+
+@app.route('/library/build', methods=['GET'])
+def library_build_status():
+    return jsonify(course_library.status())
+
+@app.route('/library/query', methods=['POST'])
+def query_library():
+    """Answer a question from the most relevant chunks across every indexed document"""
+    try:
+        data = request.json
+        query = data.get('query')
+        top_k = data.get('top_k', 5)
         
-        return jsonify({'answer': answer})
+        if not query:
+            return jsonify({'error': 'Missing query'}), 400
+        if not is_positive_int(top_k):
+            return jsonify({'error': 'top_k must be a positive integer'}), 400
+        
+        relevant_chunks = course_library.search(query, top_k=top_k)
+        if relevant_chunks is None:
+            return jsonify({'error': 'The library index has not been built yet'}), 404
+        if not relevant_chunks:
+            return jsonify({'answer': NO_CONTEXT_ANSWER, 'sources': []})
+        
+        answer = generate_answer(build_answer_prompt(query, relevant_chunks))
+        return jsonify({'answer': answer, 'sources': relevant_chunks})
     except Exception as e:
         return jsonify({'error': str(e)}), 500
 
@@ -201,7 +945,8 @@ class TopicCompetence:
     score: float
     confidence: ConfidenceLevel
     last_updated: datetime
-    responses: List[TopicResponse] = field(default_factory=list)
+    # Columnar history; iterating it yields rows that read like TopicResponse
+    responses: ResponseLog = field(default_factory=lambda: ResponseLog(DifficultyLevel))
 
 @dataclass
 class Student:
@@ -213,15 +958,24 @@ class CompetenceScoreCalculator:
     def calculate_competence_score(topic: str, responses: List[TopicResponse]) -> float:
         if not responses:
             return 0
+        if isinstance(responses, ResponseLog):
+            return CompetenceScoreCalculator.score_from_totals(*responses.totals())
 
-        total_questions = len(responses)
-        correct_answers = sum(1 for r in responses if r.is_correct)
-        accuracy = correct_answers / total_questions
-
-        weighted_difficulty_score = sum(
-            r.difficulty.value * r.quality_score for r in responses if r.is_correct
+        return CompetenceScoreCalculator.score_from_totals(
+            total_questions=len(responses),
+            correct_answers=sum(1 for r in responses if r.is_correct),
+            weighted_difficulty_score=sum(r.difficulty.value * r.quality_score for r in responses if r.is_correct),
+            total_difficulty=sum(r.difficulty.value for r in responses)
         )
-        total_difficulty = sum(r.difficulty.value for r in responses)
+
+    @staticmethod
+    def score_from_totals(total_questions: int, correct_answers: int, weighted_difficulty_score: float,
+                          total_difficulty: int) -> float:
+        """The competence score from running totals, so stored students never rescan their history"""
+        if not total_questions:
+            return 0
+
+        accuracy = correct_answers / total_questions
 
         accuracy_weight = min(0.6, 0.4 + (total_questions / 100))
         difficulty_weight = 1 - accuracy_weight
@@ -236,81 +990,252 @@ class CompetenceScoreCalculator:
 
     @staticmethod
     def calculate_confidence(responses: List[TopicResponse]) -> ConfidenceLevel:
-        total_questions = len(responses)
+        return CompetenceScoreCalculator.confidence_for_count(len(responses))
+
+    @staticmethod
+    def confidence_for_count(total_questions: int) -> ConfidenceLevel:
         if total_questions < 5:
             return ConfidenceLevel.Low
         if total_questions < 20:
             return ConfidenceLevel.Medium
         return ConfidenceLevel.High
 
-def generate_mcq_questions(topic: str, num_questions: int = 5) -> List[Dict]:
+# Quizzes are generated in small batches that run concurrently; questions that
+# fail validation are asked for again, up to MCQ_MAX_ROUNDS times
+MCQ_BATCH_SIZE = 3
+MCQ_CONCURRENCY = 4
+MCQ_MAX_ROUNDS = 3
+# Largest quiz one request may ask for, which bounds the LLM batches it can queue
+MCQ_MAX_QUESTIONS = 20
+# Questions asked of each chunk when a quiz is generated from a document
+MCQ_PER_CHUNK = 2
+MCQ_SYSTEM_PROMPT = 'You are a helpful assistant that generates multiple-choice questions. Always respond with a JSON object of the form {"questions": [...]} with correct_option as an integer index.'
+
+def mcq_prompt(topic: str, num_questions: int, difficulty: Optional[int] = None, context: Optional[str] = None) -> str:
+    if context:
+        subject = f"based only on the following text:\n---\n{context}\n---\n"
+    else:
+        subject = f"on the topic of {topic}. "
+    prompt = f"Generate {num_questions} multiple-choice questions (MCQs) {subject}Each question should have 4 options and a correct answer. Provide the response as a JSON object with a 'questions' list whose items have the fields: 'question', 'options', 'correct_option', and 'difficulty' (1-5). The 'correct_option' should be the index (1-4) of the correct answer, not the text of the correct answer."
+    if difficulty:
+        prompt += f" Every question should have difficulty {difficulty}."
+    return prompt
+
+def parse_mcq_candidates(content: str) -> List:
+    """Question objects from a model response. If the JSON as a whole is
+    broken (usually cut off mid-question), every complete question object in
+    it is still recovered"""
+    content = re.sub(r'^```(json)?|```$', '', content.strip(), flags=re.MULTILINE).strip()
     try:
-        prompt = f"Generate {num_questions} multiple-choice questions (MCQs) on the topic of {topic}. Each question should have 4 options and a correct answer. Provide the response as a valid JSON list with fields: 'question', 'options', 'correct_option', and 'difficulty' (1-5). The 'correct_option' should be the index (1-4) of the correct answer, not the text of the correct answer."
-        
-        response = ollama.chat(
-            model='mistral',
+        parsed = json.loads(content)
+    except json.JSONDecodeError:
+        decoder = json.JSONDecoder()
+        parsed = []
+        position = content.find('{')
+        while position != -1:
+            try:
+                candidate, end = decoder.raw_decode(content, position)
+            except json.JSONDecodeError:
+                position = content.find('{', position + 1)
+                continue
+            if isinstance(candidate, dict) and 'question' in candidate:
+                parsed.append(candidate)
+            position = content.find('{', end)
+
+    if isinstance(parsed, dict):
+        parsed = parsed.get('questions', [parsed])
+    return parsed if isinstance(parsed, list) else []
+
+def validate_mcq(q, difficulty: Optional[int] = None) -> Optional[Dict]:
+    """A cleaned copy of one generated question, or None if it is unusable"""
+    try:
+        options = [str(opt) for opt in q['options']]
+        question = str(q['question']).strip()
+        correct_option = q.get('correct_option', 0)
+        if isinstance(correct_option, str) and correct_option in options:
+            correct_option = options.index(correct_option) + 1
+        correct_option = int(correct_option)
+        question_difficulty = int(q.get('difficulty', 2))
+    except (KeyError, TypeError, ValueError):
+        return None
+
+    # A question without 4 options or a usable answer key can't be graded
+    if not question or len(options) != 4 or not 1 <= correct_option <= 4:
+        return None
+
+    if difficulty:
+        question_difficulty = difficulty
+    elif not (1 <= question_difficulty <= 5):
+        question_difficulty = 2  # Default to medium difficulty
+
+    return {
+        'question': question,
+        'options': options,
+        'correct_option': correct_option,
+        'difficulty': question_difficulty
+    }
+
+def request_mcq_batch(topic: str, num_questions: int, difficulty: Optional[int] = None,
+                      context: Optional[str] = None) -> List[Dict]:
+    """One model call for a few questions; returns the ones that validate"""
+    try:
+        response = llm_gateway.chat(
+            model=LLM_MODEL,
             messages=[
                 {
                     'role': 'system',
-                    'content': 'You are a helpful assistant that generates multiple-choice questions. Always provide a valid JSON response with correct_option as an integer index.'
+                    'content': MCQ_SYSTEM_PROMPT
                 },
                 {
                     'role': 'user',
-                    'content': prompt
+                    'content': mcq_prompt(topic, num_questions, difficulty, context)
                 }
             ],
             options={
                 'temperature': 0.7,
                 'top_p': 0.9,
                 'max_tokens': 1000
-            }
+            },
+            format='json'
         )
-        
-        content = response['message']['content'].strip()
-        content = re.sub(r'^```(json)?|```$', '', content, flags=re.MULTILINE).strip()
-        
-        questions = json.loads(content)
-        
-        validated_questions = []
-        for q in questions:
-            validated_q = {
-                'question': str(q['question']),
-                'options': [str(opt) for opt in q['options']],
-                'correct_option': int(q.get('correct_option', 0)),
-                'difficulty': int(q.get('difficulty', 2))
-            }
-            
-            if not (1 <= validated_q['correct_option'] <= 4):
-                validated_q['correct_option'] = 1  # Default to first option if invalid
-            
-            if not (1 <= validated_q['difficulty'] <= 5):
-                validated_q['difficulty'] = 2  # Default to medium difficulty
-            
-            if len(validated_q['options']) != 4:
-                continue  # Skip questions without 4 options
-            
-            validated_questions.append(validated_q)
-        
-        return validated_questions
-    except (json.JSONDecodeError, ValueError) as e:
-        print(f"Error parsing questions: {e}")
-        return []
+        candidates = parse_mcq_candidates(response['message']['content'])
     except Exception as e:
         print(f"Error generating questions: {e}")
         return []
 
+    validated_questions = [q for q in (validate_mcq(c, difficulty) for c in candidates) if q]
+    if len(validated_questions) < len(candidates):
+        print(f"Dropped {len(candidates) - len(validated_questions)} invalid questions on {topic}")
+    return validated_questions
+
+def iter_mcq_questions(topic: str, num_questions: int = 5, difficulty: Optional[int] = None):
+    """Yield up to num_questions distinct questions as soon as each batch
+    comes back, re-requesting only as many as are still missing"""
+    executor = concurrent.futures.ThreadPoolExecutor(max_workers=MCQ_CONCURRENCY)
+    seen = set()
+    produced = 0
+    try:
+        for _ in range(MCQ_MAX_ROUNDS):
+            missing = num_questions - produced
+            if missing <= 0:
+                return
+            futures = [
+                executor.submit(request_mcq_batch, topic, min(MCQ_BATCH_SIZE, missing - start), difficulty)
+                for start in range(0, missing, MCQ_BATCH_SIZE)
+            ]
+            for future in concurrent.futures.as_completed(futures):
+                for question in future.result():
+                    digest = question_hash(question)
+                    if produced >= num_questions or digest in seen:
+                        continue
+                    seen.add(digest)
+                    produced += 1
+                    yield question
+    finally:
+        # Don't wait for batches nobody will read if the caller stopped early
+        executor.shutdown(wait=False, cancel_futures=True)
+
+def generate_mcq_questions(topic: str, num_questions: int = 5, difficulty: Optional[int] = None) -> List[Dict]:
+    return list(iter_mcq_questions(topic, num_questions, difficulty))
+
+# Questions generated from a document chunk, keyed by a hash of the model and
+# prompt (which holds the chunk text), so the same PDF never costs a second call
+mcq_cache = DiskCache(MCQ_CACHE_FOLDER, max_bytes=MCQ_CACHE_MAX_BYTES)
+
+def chunk_mcq_questions(chunk, num_questions: int, difficulty: Optional[int] = None) -> List[Dict]:
+    """Questions about one chunk, tagged with the page they come from"""
+    key = answer_cache_key(mcq_prompt('', num_questions, difficulty, chunk["text"]))
+    cached = mcq_cache.get(key)
+    if cached is not None:
+        return cached["questions"]
+
+    questions = request_mcq_batch('the document', num_questions, difficulty, context=chunk["text"])
+    for question in questions:
+        question['page'] = chunk["page"]
+    if questions:
+        mcq_cache.set(key, {"questions": questions})
+    return questions
+
+def iter_document_mcq_questions(index: DocumentIndex, num_questions: int = 5, difficulty: Optional[int] = None):
+    """Yield up to num_questions questions drawn from a spread of the document's chunks.
+
+    Chunks are ranked by max marginal relevance over their embeddings so the
+    quiz covers the whole document instead of its most repeated passage;
+    each round asks the next chunks in that order for what is still missing.
+    """
+    wanted_chunks = -(-num_questions // MCQ_PER_CHUNK)
+    order = max_marginal_relevance(index.matrix, wanted_chunks * MCQ_MAX_ROUNDS)
+    executor = concurrent.futures.ThreadPoolExecutor(max_workers=MCQ_CONCURRENCY)
+    seen = set()
+    produced = 0
+    try:
+        while order and produced < num_questions:
+            missing_chunks = -(-(num_questions - produced) // MCQ_PER_CHUNK)
+            batch, order = order[:missing_chunks], order[missing_chunks:]
+            futures = [
+                executor.submit(chunk_mcq_questions, index.chunks[position], MCQ_PER_CHUNK, difficulty)
+                for position in batch
+            ]
+            for future in concurrent.futures.as_completed(futures):
+                for question in future.result():
+                    digest = question_hash(question)
+                    if produced >= num_questions or digest in seen:
+                        continue
+                    seen.add(digest)
+                    produced += 1
+                    yield question
+    finally:
+        executor.shutdown(wait=False, cancel_futures=True)
+
+# Questions are served from per topic/difficulty pools that a background
+# worker tops up, so starting a quiz rarely waits for the model
+question_bank = QuestionBank(
+    generate_mcq_questions,
+    low_watermark=int(os.environ.get('ALIMER_MCQ_POOL_LOW', '10')),
+    target_size=int(os.environ.get('ALIMER_MCQ_POOL_SIZE', '30'))
+)
+
+def mcq_payload(q: Dict) -> Dict:
+    payload = {
+        "id": str(uuid.uuid4()),
+        "question": q["question"],
+        "options": q["options"],
+        "correct_option": q["correct_option"],
+        "difficulty": q["difficulty"]
+    }
+    if "page" in q:
+        payload["page"] = q["page"]
+    return payload
+
+def read_mcq_request(data):
+    """(topic, num_questions, difficulty, error message); a documentId stands in for the topic"""
+    topic = data.get('topic')
+    difficulty = data.get('difficulty')
+    if not topic and not data.get('documentId'):
+        return None, None, None, "Topic is required"
+    if difficulty is not None and difficulty not in range(1, 6):
+        return None, None, None, "Difficulty must be between 1 and 5"
+    num_questions = data.get('num_questions', 5)
+    if not is_positive_int(num_questions) or num_questions > MCQ_MAX_QUESTIONS:
+        return None, None, None, f"num_questions must be an integer between 1 and {MCQ_MAX_QUESTIONS}"
+    return topic, num_questions, difficulty, None
+
 # API Routes
 @app.route('/generate-mcq', methods=['POST'])
 def generate_mcq():
     try:
         data = request.json
-        topic = data.get('topic')
-        num_questions = data.get('num_questions', 5)
+        topic, num_questions, difficulty, error = read_mcq_request(data)
+        if error:
+            return jsonify({"error": error}), 400
         
-        if not topic:
-            return jsonify({"error": "Topic is required"}), 400
-            
-        questions = generate_mcq_questions(topic, num_questions)
+        if data.get('documentId'):
+            index = document_indexes.get(data['documentId'])
+            if index is None:
+                return jsonify({"error": "Unknown document, please upload it again"}), 404
+            questions = list(iter_document_mcq_questions(index, num_questions, difficulty))
+        else:
+            questions = question_bank.take_or_generate(topic, difficulty, num_questions)
         
         if not questions:
             return jsonify({"error": "Failed to generate questions"}), 500
@@ -318,43 +1243,121 @@ def generate_mcq():
         # Add topic to the response for reference
         response_data = {
             "topic": topic,
-            "questions": [
-                {
-                    "id": str(uuid.uuid4()),
-                    "question": q["question"],
-                    "options": q["options"],
-                    "correct_option": q["correct_option"],
-                    "difficulty": q["difficulty"]
-                } for q in questions
-            ]
+            "questions": [mcq_payload(q) for q in questions]
         }
         
         return jsonify(response_data)
     except Exception as e:
         return jsonify({"error": str(e)}), 500
 
+@app.route('/generate-mcq/stream', methods=['POST'])
+def generate_mcq_stream():
+    """Stream a quiz as NDJSON: pooled questions first, then each generated
+    question as soon as it validates, and finally a done line with the count"""
+    data = request.json or {}
+    topic, num_questions, difficulty, error = read_mcq_request(data)
+    if error:
+        return jsonify({"error": error}), 400
+
+    index = None
+    if data.get('documentId'):
+        index = document_indexes.get(data['documentId'])
+        if index is None:
+            return jsonify({"error": "Unknown document, please upload it again"}), 404
+
+    def generate():
+        count = 0
+        try:
+            if index is not None:
+                for q in iter_document_mcq_questions(index, num_questions, difficulty):
+                    count += 1
+                    yield json.dumps({'type': 'question', **mcq_payload(q)}) + '\n'
+                yield json.dumps({'type': 'done', 'documentId': index.document_id, 'count': count}) + '\n'
+                return
+
+            served = question_bank.take(topic, difficulty, num_questions)
+            for q in served:
+                count += 1
+                yield json.dumps({'type': 'question', **mcq_payload(q)}) + '\n'
+
+            if count < num_questions:
+                repeats = []
+                for q in iter_mcq_questions(topic, num_questions - count, difficulty):
+                    # Skip anything this topic has handed out recently
+                    fresh = question_bank.claim(topic, difficulty, [q])
+                    if not fresh:
+                        repeats.append(q)
+                    for q in fresh:
+                        count += 1
+                        served.append(q)
+                        yield json.dumps({'type': 'question', **mcq_payload(q)}) + '\n'
+                # Repeats are better than a short quiz when the model ran out of new questions
+                for q in question_bank.claim_repeats(topic, difficulty, repeats, served, num_questions - count):
+                    count += 1
+                    yield json.dumps({'type': 'question', **mcq_payload(q)}) + '\n'
+
+            yield json.dumps({'type': 'done', 'topic': topic, 'count': count}) + '\n'
+        except Exception as e:
+            yield json.dumps({'type': 'error', 'error': str(e)}) + '\n'
+
+    return Response(stream_with_context(generate()), mimetype='application/x-ndjson')
+
+# Per-student running totals, so a new answer updates a score in O(1)
+competence_store = CompetenceStore(COMPETENCE_DB_PATH)
+
+def parse_topic_responses(user_responses) -> ResponseLog:
+    topic_responses = ResponseLog(DifficultyLevel, capacity=len(user_responses))
+    now = datetime.now()
+    for resp in user_responses:
+        topic_responses.append(
+            question_id=resp.get("question_id", str(uuid.uuid4())),
+            difficulty=DifficultyLevel(resp.get("difficulty", 2)),
+            is_correct=resp.get("is_correct", False),
+            quality_score=resp.get("quality_score", 1.0),
+            timestamp=now
+        )
+    return topic_responses
+
+def record_responses(user_id: str, topic: str, topic_responses: ResponseLog) -> Dict:
+    columns = topic_responses.columns()
+    return competence_store.record(
+        user_id, topic, zip(columns["difficulty"].tolist(), columns["is_correct"].tolist(),
+                            columns["quality_score"].tolist())
+    )
+
+def competence_payload(totals: Dict) -> Dict:
+    """The /calculate-competence response for a row of stored totals"""
+    competence_score = CompetenceScoreCalculator.score_from_totals(
+        totals["responses"], totals["correct"], totals["weighted_difficulty"], totals["total_difficulty"]
+    )
+    return {
+        "topic": totals["topic"],
+        "competence_score": competence_score,
+        "normalized_score": round(competence_score / 10, 2),  # Normalize to 0-10 scale
+        "confidence_level": CompetenceScoreCalculator.confidence_for_count(totals["responses"]).value,
+        "total_questions": totals["responses"],
+        "correct_answers": totals["correct"],
+        "last_updated": datetime.fromtimestamp(totals["last_updated"]).isoformat()
+    }
+
 @app.route('/calculate-competence', methods=['POST'])
 def calculate_competence():
     try:
         data = request.json
         topic = data.get('topic')
         user_responses = data.get('responses', [])
+        user_id = data.get('user_id')
         
         if not topic or not user_responses:
             return jsonify({"error": "Topic and responses are required"}), 400
             
         # Convert responses to TopicResponse objects
-        topic_responses = []
-        for resp in user_responses:
-            topic_responses.append(
-                TopicResponse(
-                    question_id=resp.get("question_id", str(uuid.uuid4())),
-                    difficulty=DifficultyLevel(resp.get("difficulty", 2)),
-                    is_correct=resp.get("is_correct", False),
-                    quality_score=resp.get("quality_score", 1.0),
-                    timestamp=datetime.now()
-                )
-            )
+        topic_responses = parse_topic_responses(user_responses)
+        
+        # With a user_id the responses are added to the student's stored
+        # history and the score covers everything answered so far
+        if user_id:
+            return jsonify({"user_id": user_id, **competence_payload(record_responses(user_id, topic, topic_responses))})
             
         competence_score = CompetenceScoreCalculator.calculate_competence_score(topic, topic_responses)
         confidence_level = CompetenceScoreCalculator.calculate_confidence(topic_responses)
@@ -365,13 +1368,88 @@ def calculate_competence():
             "normalized_score": round(competence_score / 10, 2),  # Normalize to 0-10 scale
             "confidence_level": confidence_level.value,
             "total_questions": len(topic_responses),
-            "correct_answers": sum(1 for r in topic_responses if r.is_correct)
+            "correct_answers": topic_responses.totals()[1]
         }
         
         return jsonify(response_data)
     except Exception as e:
         return jsonify({"error": str(e)}), 500
 
+@app.route('/calculate-competence/bulk', methods=['POST'])
+def calculate_competence_bulk():
+    """Score every (student, topic) pair at once from columnar answers:
+    parallel student_ids, topics, difficulty and is_correct lists, plus an
+    optional quality_score list"""
+    try:
+        data = request.json
+        columns = [data.get(name) for name in ('student_ids', 'topics', 'difficulty', 'is_correct')]
+        quality_score = data.get('quality_score')
+        
+        if not all(isinstance(column, list) and column for column in columns):
+            return jsonify({"error": "student_ids, topics, difficulty and is_correct are required"}), 400
+        if len({len(column) for column in columns + ([quality_score] if quality_score is not None else [])}) != 1:
+            return jsonify({"error": "All columns must have the same length"}), 400
+        
+        difficulty = np.asarray(columns[2])
+        if difficulty.dtype.kind not in 'iu' or difficulty.min() < 1 or difficulty.max() > 5:
+            return jsonify({"error": "Difficulty must be an integer between 1 and 5"}), 400
+        
+        results = bulk_competence(columns[0], columns[1], difficulty, columns[3], quality_score)
+        scores = results["competence_score"]
+        
+        return jsonify({
+            "results": [
+                {
+                    "user_id": str(user_id),
+                    "topic": str(topic),
+                    "competence_score": float(score),
+                    "normalized_score": round(float(score) / 10, 2),
+                    "confidence_level": str(confidence),
+                    "total_questions": int(total),
+                    "correct_answers": int(correct)
+                } for user_id, topic, score, confidence, total, correct in zip(
+                    results["student_id"], results["topic"], scores, results["confidence_level"],
+                    results["total_questions"], results["correct_answers"]
+                )
+            ]
+        })
+    except Exception as e:
+        return jsonify({"error": str(e)}), 500
+
+@app.route('/students/<user_id>/responses', methods=['POST'])
+def record_student_responses(user_id):
+    """Record new answers for a student and return their updated competence in the topic"""
+    try:
+        data = request.json
+        topic = data.get('topic')
+        user_responses = data.get('responses', [])
+        
+        if not topic or not user_responses:
+            return jsonify({"error": "Topic and responses are required"}), 400
+            
+        totals = record_responses(user_id, topic, parse_topic_responses(user_responses))
+        return jsonify({"user_id": user_id, **competence_payload(totals)})
+    except Exception as e:
+        return jsonify({"error": str(e)}), 500
+
+@app.route('/students/<user_id>/competence', methods=['GET'])
+def get_student_competence(user_id):
+    topic = request.args.get('topic')
+    if topic:
+        totals = competence_store.get(user_id, topic)
+        if totals is None:
+            return jsonify({"error": "No responses recorded for this topic"}), 404
+        return jsonify({"user_id": user_id, **competence_payload(totals)})
+    return jsonify({
+        "user_id": user_id,
+        "topics": [competence_payload(totals) for totals in competence_store.topics(user_id)]
+    })
+
+@app.route('/students/<user_id>/competence', methods=['DELETE'])
+def reset_student_competence(user_id):
+    removed = competence_store.reset(user_id, request.args.get('topic'))
+    return jsonify({"user_id": user_id, "removed": removed})
+
 class ComplexityLevel(Enum):
     BEGINNER = 1
     ELEMENTARY = 2
@@ -389,9 +1467,17 @@ class MaterialType(Enum):
     BLOG = "blog"
     OTHER = "other"
 
+# lxml builds the same BeautifulSoup tree several times faster than the
+# pure Python html.parser, which stays as the fallback when it isn't installed
+HTML_PARSER = 'lxml' if importlib.util.find_spec('lxml') else 'html.parser'
+VIDEO_EMBED_PATTERN = re.compile(r'youtube|vimeo')
+
 class ContentScraper:
-    def __init__(self):
+    def __init__(self, limiter: Optional[HostLimiter] = None, http_cache: Optional[HttpCache] = None):
         self.session = requests.Session()
+        self.limiter = limiter or HostLimiter(SCRAPE_MAX_PER_HOST, SCRAPE_HOST_INTERVAL)
+        self.http_cache = http_cache
+        self._user_agent_lock = threading.Lock()
         self.user_agents = [
             'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/91.0.4472.124 Safari/537.36',
             'Mozilla/5.0 (Macintosh; Intel Mac OS X 10_15_7) AppleWebKit/605.1.15 (KHTML, like Gecko) Version/14.1.1 Safari/605.1.15',
@@ -399,27 +1485,50 @@ class ContentScraper:
         ]
         self.session.headers.update({'User-Agent': self.user_agents[0]})
         
-    def _rotate_user_agent(self):
+    def _rotate_user_agent(self) -> str:
         """Rotate user agents to avoid being blocked"""
-        current = self.session.headers['User-Agent']
-        index = self.user_agents.index(current)
-        next_index = (index + 1) % len(self.user_agents)
-        self.session.headers.update({'User-Agent': self.user_agents[next_index]})
+        # Under a lock because pages are fetched from several threads at once
+        with self._user_agent_lock:
+            current = self.session.headers['User-Agent']
+            index = self.user_agents.index(current)
+            next_index = (index + 1) % len(self.user_agents)
+            self.session.headers.update({'User-Agent': self.user_agents[next_index]})
+            return self.user_agents[next_index]
         
     def fetch_webpage(self, url: str) -> Optional[str]:
         """Fetch a webpage and return its HTML content"""
         try:
-            self._rotate_user_agent()
-            response = self.session.get(url, timeout=10)
+            user_agent = self._rotate_user_agent()
+            if self.http_cache is not None:
+                return self.http_cache.get(url, self._send, {'User-Agent': user_agent})
+            response = self._send(url, {'User-Agent': user_agent})
             response.raise_for_status()
             return response.text
         except requests.RequestException as e:
             return None
             
+    def _send(self, url: str, headers: Dict) -> requests.Response:
+        # Only requests that reach the network wait for the host's turn
+        with self.limiter.limit(url):
+            return self.session.get(url, headers=headers, timeout=SCRAPE_TIMEOUT)
+            
+    def analyze_page(self, html: str, url: str) -> Dict:
+        """Text, metadata and material type of a page from a single parse"""
+        soup = self._parse(html)
+        # Metadata first: extracting the text strips header, nav and footer
+        page = self._meta_from_soup(soup, url)
+        page["text"] = self._text_from_soup(soup)
+        return page
+        
+    @staticmethod
+    def _parse(html: str) -> BeautifulSoup:
+        return BeautifulSoup(html, HTML_PARSER)
+            
     def extract_text_content(self, html: str) -> str:
         """Extract meaningful text content from HTML"""
-        soup = BeautifulSoup(html, 'html.parser')
+        return self._text_from_soup(self._parse(html))
         
+    def _text_from_soup(self, soup: BeautifulSoup) -> str:
         # Remove script and style elements
         for script in soup(["script", "style", "nav", "footer", "header"]):
             script.decompose()
@@ -441,8 +1550,9 @@ class ContentScraper:
         
     def extract_meta_information(self, html: str, url: str) -> Dict:
         """Extract metadata from the webpage"""
-        soup = BeautifulSoup(html, 'html.parser')
+        return self._meta_from_soup(self._parse(html), url)
         
+    def _meta_from_soup(self, soup: BeautifulSoup, url: str) -> Dict:
         # Extract title
         title = soup.find('title')
         title_text = title.get_text(strip=True) if title else ""
@@ -496,17 +1606,30 @@ class ContentScraper:
         elif 'book' in url_lower:
             return MaterialType.BOOK
             
-        # Check content patterns
-        if soup.find('video') or soup.find('iframe', src=re.compile(r'youtube|vimeo')):
+        # Check content patterns, in one walk of the tree
+        if soup.find(self._is_video_tag):
             return MaterialType.VIDEO
         
         # Default to article for text-based content
         return MaterialType.ARTICLE
         
+    @staticmethod
+    def _is_video_tag(tag) -> bool:
+        return tag.name == 'video' or (tag.name == 'iframe' and bool(VIDEO_EMBED_PATTERN.search(tag.get('src') or '')))
+        
+# Part of every complexity cache key; bump it when the prompt, options or
+# parsing in _assess_with_llm change so older assessments are not reused
+COMPLEXITY_PROMPT_VERSION = 1
+# Characters of the sampled text sent to the model
+COMPLEXITY_PROMPT_CHARS = 1500
+
 class ComplexityAnalyzer:
-    def __init__(self):
-        # Initialize readability metrics
-        pass
+    def __init__(self, cache: Optional[DiskCache] = None, classifier: Optional[ComplexityClassifier] = None):
+        # Assessments keyed by the text the model sees, so unchanged pages
+        # are never sent to it twice
+        self.cache = cache
+        # Local tier that answers confident cases and learns from the LLM's answers
+        self.classifier = classifier
         
     def analyze_text_complexity(self, text: str) -> Dict:
         """Analyze text complexity using readability metrics and LLM"""
@@ -521,16 +1644,37 @@ class ComplexityAnalyzer:
                 }
             }
         
+        # Sample the text if it's too long
+        sample_text = self._sample_text(text, max_len=2000)
+        
+        # A page assessed before costs neither an embedding nor a model call
+        if self.cache is not None:
+            cached = self.cache.get(self._cache_key(sample_text))
+            if cached is not None:
+                return cached
+        
         # Calculate basic metrics
+        ensure_punkt()
         sentences = sent_tokenize(text)
         avg_sentence_length = sum(len(s.split()) for s in sentences) / len(sentences) if sentences else 0
         
-        # Sample the text if it's too long
-        sample_text = self._sample_text(text, max_len=2000)
+        if self.classifier is None:
+            return self._assess_with_llm(sample_text)
         
-        # Get LLM assessment
-        llm_assessment = self._assess_with_llm(sample_text)
+        # Readability and embedding features of the page; the local model
+        # answers when it is confident, otherwise the LLM does and its answer
+        # becomes a training example
+        features = self.classifier.features(sentences, sample_text)
+        local_assessment = self.classifier.predict(features)
+        if local_assessment is not None and local_assessment["confidence"] >= self.classifier.threshold:
+            self.classifier.record_outcome(handled_locally=True)
+            return local_assessment
         
+        self.classifier.record_outcome(handled_locally=False)
+        llm_assessment = self._request_llm_assessment(sample_text)
+        if llm_assessment is None:
+            return local_assessment or self._fallback_assessment()
+        self.classifier.observe(features, llm_assessment["complexity_level"], self._cache_key(sample_text))
         return llm_assessment
     
     def _sample_text(self, text: str, max_len: int = 2000) -> str:
@@ -547,15 +1691,30 @@ class ComplexityAnalyzer:
         
         return f"{first_chunk}...\n\n{middle_chunk}...\n\n{last_chunk}"
     
+    @staticmethod
+    def _cache_key(text: str) -> str:
+        prompt_text = text[:COMPLEXITY_PROMPT_CHARS]
+        return hashlib.sha256(f"{LLM_MODEL}\n{COMPLEXITY_PROMPT_VERSION}\n{prompt_text}".encode('utf-8')).hexdigest()
+    
     def _assess_with_llm(self, text: str) -> Dict:
         """Use LLM to assess complexity"""
+        return self._request_llm_assessment(text) or self._fallback_assessment()
+    
+    def _request_llm_assessment(self, text: str) -> Optional[Dict]:
+        """The LLM's assessment, or None if the call or its JSON failed"""
+        key = self._cache_key(text)
+        if self.cache is not None:
+            cached = self.cache.get(key)
+            if cached is not None:
+                return cached
+        
         try:
             prompt = f"""
             Analyze the following educational text and determine its complexity level. 
             
             Text sample:
             ---
-            {text[:1500]}
+            {text[:COMPLEXITY_PROMPT_CHARS]}
             ---
             
             Rate the complexity on a scale from 1 to 5:
@@ -577,8 +1736,8 @@ class ComplexityAnalyzer:
             - factors (object with assessment of key complexity factors)
             """
             
-            response = ollama.chat(
-                model='mistral',
+            response = llm_gateway.chat(
+                model=LLM_MODEL,
                 messages=[
                     {
                         'role': 'system',
@@ -615,28 +1774,37 @@ class ComplexityAnalyzer:
             if not isinstance(factors, dict):
                 factors = {}
                 
-            return {
+            assessment = {
                 "complexity_level": complexity_level,
                 "confidence": confidence,
                 "factors": factors
             }
+            # Failures are not cached, so a failed call is retried next time
+            if self.cache is not None:
+                self.cache.set(key, assessment)
+            return assessment
             
         except Exception as e:
-            # Fallback to intermediate complexity
-            return {
-                "complexity_level": ComplexityLevel.INTERMEDIATE.value,
-                "confidence": 0.5,
-                "factors": {
-                    "technical_vocabulary": "moderate",
-                    "concept_complexity": "moderate",
-                    "prior_knowledge": "some required"
-                }
+            return None
+    
+    @staticmethod
+    def _fallback_assessment() -> Dict:
+        # Fallback to intermediate complexity
+        return {
+            "complexity_level": ComplexityLevel.INTERMEDIATE.value,
+            "confidence": 0.5,
+            "factors": {
+                "technical_vocabulary": "moderate",
+                "concept_complexity": "moderate",
+                "prior_knowledge": "some required"
             }
+        }
 
 class ResourcesFinder:
-    def __init__(self):
-        self.scraper = ContentScraper()
-        self.analyzer = ComplexityAnalyzer()
+    def __init__(self, http_cache: Optional[HttpCache] = None, complexity_cache: Optional[DiskCache] = None,
+                 complexity_classifier: Optional[ComplexityClassifier] = None):
+        self.scraper = ContentScraper(http_cache=http_cache)
+        self.analyzer = ComplexityAnalyzer(complexity_cache, complexity_classifier)
         self.search_engines = [
             "https://www.google.com/search?q=",
             "https://duckduckgo.com/?q="
@@ -658,47 +1826,66 @@ class ResourcesFinder:
         # Search for URLs
         urls = self._search_web(query, num_results * 2)  # Get more results as some might fail
         
-        # Process and filter the results
+        # Fetch and analyze every candidate at once and keep pages as they
+        # arrive; the scraper's host limiter stands in for a sleep between them
         results = []
-        for url in urls[:num_results*2]:
-            try:
-                html = self.scraper.fetch_webpage(url)
-                if not html:
-                    continue
-                    
-                text = self.scraper.extract_text_content(html)
-                if len(text.strip()) < 100:  # Skip pages with little content
+        cancelled = threading.Event()
+        executor = concurrent.futures.ThreadPoolExecutor(max_workers=SCRAPE_CONCURRENCY)
+        try:
+            futures = [executor.submit(self._process_url, url, complexity_level, cancelled) for url in urls[:num_results*2]]
+            for future in concurrent.futures.as_completed(futures):
+                try:
+                    material = future.result()
+                except Exception as e:
+                    print(e)
                     continue
-                    
-                meta = self.scraper.extract_meta_information(html, url)
-                complexity = self.analyzer.analyze_text_complexity(text)
-                
-                # Only include resources within +/- 1 complexity level of target
-                if abs(complexity["complexity_level"] - complexity_level) <= 3:
-                    results.append({
-                        "url": url,
-                        "title": meta["title"],
-                        "description": meta["description"],
-                        "author": meta["author"],
-                        "date": meta["date"],
-                        "material_type": meta["material_type"],
-                        "complexity": complexity["complexity_level"],
-                        "complexity_confidence": complexity["confidence"],
-                        "complexity_factors": complexity["factors"],
-                        "preview_text": text[:500] + "..." if len(text) > 500 else text
-                    })
-                    
+                if material:
+                    results.append(material)
                     if len(results) >= num_results:
                         break
-                        
-                # Respect rate limits
-                time.sleep(1)
-                    
-            except Exception as e:
-                print(e)
+        finally:
+            # Pages still queued are dropped once enough materials were found,
+            # and pages already being fetched stop before they are analyzed
+            cancelled.set()
+            executor.shutdown(wait=False, cancel_futures=True)
                 
         return results[:num_results]
         
+    def _process_url(self, url: str, complexity_level: int, cancelled: Optional[threading.Event] = None) -> Optional[Dict]:
+        """Fetch, parse and score one candidate page; None if it doesn't qualify
+        or the search no longer needs it (cancelled is set)"""
+        if cancelled is not None and cancelled.is_set():
+            return None
+        html = self.scraper.fetch_webpage(url)
+        if not html or (cancelled is not None and cancelled.is_set()):
+            return None
+            
+        meta = self.scraper.analyze_page(html, url)
+        text = meta["text"]
+        if len(text.strip()) < 100:  # Skip pages with little content
+            return None
+        # The complexity analysis calls the LLM, the slowest step by far
+        if cancelled is not None and cancelled.is_set():
+            return None
+            
+        complexity = self.analyzer.analyze_text_complexity(text)
+        
+        # Only include resources within +/- 1 complexity level of target
+        if abs(complexity["complexity_level"] - complexity_level) > 3:
+            return None
+        return {
+            "url": url,
+            "title": meta["title"],
+            "description": meta["description"],
+            "author": meta["author"],
+            "date": meta["date"],
+            "material_type": meta["material_type"],
+            "complexity": complexity["complexity_level"],
+            "complexity_confidence": complexity["confidence"],
+            "complexity_factors": complexity["factors"],
+            "preview_text": text[:500] + "..." if len(text) > 500 else text
+        }
+        
     def _search_web(self, query: str, num_results: int) -> List[str]:
         """Mock web search function that returns URLs
         In a real implementation, you would use a search API or web scraping"""
@@ -724,8 +1911,54 @@ class ResourcesFinder:
         # For demo/prototype purposes only - in production use a proper search API
         encoded_query = query.replace(' ', '+')
         return [f"{base}{encoded_query}" for base in base_urls[:num_results]]
+# Scraped pages are shared by every /materials call and revalidated with
+# conditional GETs once they go stale
+http_cache = HttpCache(HTTP_CACHE_FOLDER, max_bytes=HTTP_CACHE_MAX_BYTES, default_max_age=HTTP_CACHE_DEFAULT_TTL)
+
+# Complexity assessments survive restarts, so only new or changed pages cost an LLM call
+complexity_cache = DiskCache(COMPLEXITY_CACHE_FOLDER, max_bytes=COMPLEXITY_CACHE_MAX_BYTES)
+
+# Readability features plus the retrieval model's embedding of the page
+complexity_classifier = ComplexityClassifier(
+    COMPLEXITY_MODEL_FOLDER,
+    embed=lambda texts: retrieval_engine.encode(texts).float().cpu().numpy(),
+    threshold=COMPLEXITY_LOCAL_THRESHOLD
+) if os.environ.get('ALIMER_COMPLEXITY_LOCAL', '1') == '1' else None
+
 # Initialize resources finder
-resources_finder = ResourcesFinder()
+resources_finder = ResourcesFinder(http_cache, complexity_cache, complexity_classifier)
+
+@app.route('/metrics/http-cache', methods=['GET'])
+def http_cache_metrics():
+    return jsonify(http_cache.stats())
+
+@app.route('/materials/cache', methods=['DELETE'])
+def purge_http_cache():
+    return jsonify({'removed': http_cache.purge()})
+
+@app.route('/materials/complexity-cache', methods=['GET'])
+def complexity_cache_stats():
+    return jsonify(complexity_cache.stats())
+
+@app.route('/materials/complexity-cache', methods=['DELETE'])
+def purge_complexity_cache():
+    return jsonify({'removed': complexity_cache.purge()})
+
+@app.route('/materials/complexity-model', methods=['GET'])
+def complexity_model_report():
+    """How the local complexity tier agrees with the LLM on held-out pages, and how often it answers"""
+    if complexity_classifier is None:
+        return jsonify({'error': 'The local complexity classifier is disabled'}), 404
+    return jsonify(complexity_classifier.calibration_report())
+
+@app.route('/materials/complexity-model/train', methods=['POST'])
+def train_complexity_model():
+    if complexity_classifier is None:
+        return jsonify({'error': 'The local complexity classifier is disabled'}), 404
+    try:
+        return jsonify(complexity_classifier.fit())
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
 
 @app.route('/materials', methods=['POST'])
 def get_materials():
@@ -769,5 +2002,7 @@ def get_materials():
     except Exception as e:
         return jsonify({"error": str(e)}), 500
 
+report_startup()
+
 if __name__ == '__main__':
     app.run(debug=True)
\ No newline at end of file
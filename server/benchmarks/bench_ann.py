@@ -0,0 +1,81 @@
+"""Measure recall@k and search latency of the IVF index against exact search.
+
+By default the vectors are synthetic clustered unit vectors of the same width
+as all-mpnet-base-v2; pass --library to use a library built with
+POST /library/build instead.
+
+Run from the server folder:
+    python -m benchmarks.bench_ann --vectors 200000 --nprobe 4 8 16 32
+"""
+import argparse
+import os
+import time
+import numpy as np
+from ann_index import build_index, load_index
+
+def synthetic_vectors(count: int, dim: int, clusters: int, seed: int = 0) -> np.ndarray:
+    rng = np.random.default_rng(seed)
+    centers = rng.normal(size=(clusters, dim))
+    vectors = centers[rng.integers(0, clusters, count)] + rng.normal(scale=0.6, size=(count, dim))
+    vectors /= np.linalg.norm(vectors, axis=1, keepdims=True)
+    return vectors.astype(np.float32)
+
+def percentile_ms(samples, q):
+    return np.percentile(samples, q) * 1000
+
+def time_searches(index, queries, top_k, **options):
+    latencies, results = [], []
+    for query in queries:
+        start = time.perf_counter()
+        _, ids = index.search(query, top_k=top_k, **options)
+        latencies.append(time.perf_counter() - start)
+        results.append(ids[0])
+    return latencies, results
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--library", help="folder of a built library index to take vectors from")
+    parser.add_argument("--vectors", type=int, default=100000)
+    parser.add_argument("--dim", type=int, default=768)
+    parser.add_argument("--clusters", type=int, default=1000)
+    parser.add_argument("--queries", type=int, default=200)
+    parser.add_argument("--top-k", type=int, default=10)
+    parser.add_argument("--nprobe", type=int, nargs="+", default=[1, 4, 8, 16, 32])
+    parser.add_argument("--workdir", default="uploads/bench_ann", help="where the IVF index is saved and memory-mapped from")
+    args = parser.parse_args()
+
+    if args.library:
+        vectors = np.asarray(load_index(args.library).vectors, dtype=np.float32)
+    else:
+        vectors = synthetic_vectors(args.vectors, args.dim, args.clusters)
+    ids = np.arange(len(vectors), dtype=np.int64)
+
+    # Queries are perturbed copies of stored vectors, like paraphrased questions
+    rng = np.random.default_rng(1)
+    queries = vectors[rng.choice(len(vectors), args.queries, replace=False)]
+    queries = queries + rng.normal(scale=0.02, size=queries.shape)
+    queries = (queries / np.linalg.norm(queries, axis=1, keepdims=True)).astype(np.float32)
+
+    print(f"{len(vectors)} vectors of dim {vectors.shape[1]}, {len(queries)} queries, top {args.top_k}")
+
+    exact = build_index('exact', vectors, ids)
+    exact_latencies, exact_results = time_searches(exact, queries, args.top_k)
+    print(f"{'exact':>12}  recall@{args.top_k} 1.000  p50 {percentile_ms(exact_latencies, 50):8.2f} ms  "
+          f"p95 {percentile_ms(exact_latencies, 95):8.2f} ms")
+
+    start = time.perf_counter()
+    build_index('ivf', vectors, ids).save(args.workdir)
+    print(f"ivf build + save: {time.perf_counter() - start:.1f}s")
+    ivf = load_index(os.path.abspath(args.workdir))
+
+    for nprobe in args.nprobe:
+        latencies, results = time_searches(ivf, queries, args.top_k, nprobe=nprobe)
+        recall = np.mean([
+            len(set(found.tolist()) & set(expected.tolist())) / len(expected)
+            for found, expected in zip(results, exact_results)
+        ])
+        print(f"{f'ivf/{nprobe}':>12}  recall@{args.top_k} {recall:.3f}  p50 {percentile_ms(latencies, 50):8.2f} ms  "
+              f"p95 {percentile_ms(latencies, 95):8.2f} ms")
+
+if __name__ == "__main__":
+    main()
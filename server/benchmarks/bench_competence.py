@@ -0,0 +1,72 @@
+"""Check the vectorized bulk competence scores against CompetenceScoreCalculator
+and time both on a synthetic class.
+
+Run from the server folder:
+    python -m benchmarks.bench_competence --students 2000 --topics 20 --answers 15
+"""
+import argparse
+import time
+from collections import defaultdict
+from datetime import datetime
+import numpy as np
+from app import CompetenceScoreCalculator, DifficultyLevel, TopicResponse
+from competence_bulk import bulk_competence
+
+def synthetic_answers(students: int, topics: int, answers: int, seed: int = 0):
+    rng = np.random.default_rng(seed)
+    count = students * topics * answers
+    # Vary history length per group so every confidence level shows up
+    keep = rng.random(count) < rng.uniform(0.1, 1.0, students * topics).repeat(answers)
+    student_ids = np.repeat(np.arange(students), topics * answers)[keep].astype(str)
+    topic_names = np.tile(np.repeat([f"topic-{t}" for t in range(topics)], answers), students)[keep]
+    difficulty = rng.integers(1, 6, count)[keep]
+    is_correct = (rng.random(count) < 0.6)[keep]
+    quality = rng.random(count)[keep]
+    return student_ids, topic_names, difficulty, is_correct, quality
+
+def scalar_scores(student_ids, topic_names, difficulty, is_correct, quality):
+    groups = defaultdict(list)
+    now = datetime.now()
+    for student, topic, level, correct, score in zip(student_ids, topic_names, difficulty.tolist(),
+                                                     is_correct.tolist(), quality.tolist()):
+        groups[(student, topic)].append(TopicResponse("", DifficultyLevel(level), correct, score, now))
+    return {
+        key: (CompetenceScoreCalculator.calculate_competence_score(key[1], responses),
+              CompetenceScoreCalculator.calculate_confidence(responses).value)
+        for key, responses in groups.items()
+    }
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--students", type=int, default=2000)
+    parser.add_argument("--topics", type=int, default=20)
+    parser.add_argument("--answers", type=int, default=15, help="most answers per student and topic")
+    args = parser.parse_args()
+
+    columns = synthetic_answers(args.students, args.topics, args.answers)
+    print(f"{len(columns[0])} answers from {args.students} students on {args.topics} topics")
+
+    start = time.perf_counter()
+    expected = scalar_scores(*columns)
+    scalar_seconds = time.perf_counter() - start
+
+    start = time.perf_counter()
+    results = bulk_competence(*columns)
+    bulk_seconds = time.perf_counter() - start
+
+    worst, confidence_mismatches = 0.0, 0
+    for student, topic, score, confidence in zip(results["student_id"], results["topic"],
+                                                 results["competence_score"], results["confidence_level"]):
+        expected_score, expected_confidence = expected[(student, topic)]
+        worst = max(worst, abs(float(score) - expected_score))
+        confidence_mismatches += confidence != expected_confidence
+
+    print(f"groups: {len(results['topic'])} bulk, {len(expected)} scalar")
+    # Scores are rounded to 2 places, so summation order can flip the last digit
+    print(f"max score difference {worst:.4f}, confidence mismatches {confidence_mismatches}")
+    print(f"scalar {scalar_seconds:.3f}s  bulk {bulk_seconds:.3f}s  ({scalar_seconds / bulk_seconds:.1f}x)")
+    if len(results["topic"]) != len(expected) or worst > 0.011 or confidence_mismatches:
+        raise SystemExit("bulk scores do not match the scalar calculator")
+
+if __name__ == "__main__":
+    main()
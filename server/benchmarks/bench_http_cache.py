@@ -0,0 +1,116 @@
+"""Exercise HttpCache against a local stub HTTP server and report hit rates.
+
+The stub serves pages with max-age, with only an ETag, with only
+Last-Modified, and with no-store, and counts the requests and bytes it
+sends. The script checks that fresh pages never reach the server, that
+stale ones are revalidated with a 304, that no-store pages are always
+downloaded, and that the size cap evicts old pages.
+
+Run from the server folder:
+    python -m benchmarks.bench_http_cache --rounds 20
+"""
+import argparse
+import shutil
+import tempfile
+import threading
+import time
+from email.utils import formatdate
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+import requests
+from http_cache import HttpCache
+
+PAGE = ("<html><body><main>" + "<p>Learning material about recursion and trees.</p>" * 400 + "</main></body></html>").encode()
+LAST_MODIFIED = formatdate(time.time() - 86400, usegmt=True)
+
+class StubHandler(BaseHTTPRequestHandler):
+    full_responses = 0
+    not_modified = 0
+    bytes_sent = 0
+    lock = threading.Lock()
+
+    def do_GET(self):
+        headers = {}
+        if self.path.startswith('/max-age'):
+            headers['Cache-Control'] = 'max-age=60'
+        elif self.path.startswith('/etag'):
+            headers['Cache-Control'] = 'no-cache'
+            headers['ETag'] = '"v1"'
+            if self.headers.get('If-None-Match') == '"v1"':
+                return self._not_modified(headers)
+        elif self.path.startswith('/last-modified'):
+            headers['Cache-Control'] = 'max-age=0'
+            headers['Last-Modified'] = LAST_MODIFIED
+            if self.headers.get('If-Modified-Since') == LAST_MODIFIED:
+                return self._not_modified(headers)
+        elif self.path.startswith('/no-store'):
+            headers['Cache-Control'] = 'no-store'
+
+        self.send_response(200)
+        for name, value in {**headers, 'Content-Type': 'text/html', 'Content-Length': str(len(PAGE))}.items():
+            self.send_header(name, value)
+        self.end_headers()
+        self.wfile.write(PAGE)
+        with self.lock:
+            StubHandler.full_responses += 1
+            StubHandler.bytes_sent += len(PAGE)
+
+    def _not_modified(self, headers):
+        self.send_response(304)
+        for name, value in headers.items():
+            self.send_header(name, value)
+        self.end_headers()
+        with self.lock:
+            StubHandler.not_modified += 1
+
+    def log_message(self, format, *args):
+        pass
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--rounds", type=int, default=20, help="times every page is requested")
+    args = parser.parse_args()
+
+    server = ThreadingHTTPServer(('127.0.0.1', 0), StubHandler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    base = f"http://127.0.0.1:{server.server_address[1]}"
+    folder = tempfile.mkdtemp(prefix="http-cache-")
+    session = requests.Session()
+
+    def send(url, headers):
+        return session.get(url, headers=headers, timeout=5)
+
+    try:
+        cache = HttpCache(folder, default_max_age=0)
+        paths = ['/max-age', '/etag', '/last-modified', '/no-store']
+        start = time.perf_counter()
+        for _ in range(args.rounds):
+            for path in paths:
+                if cache.get(base + path, send).encode() != PAGE:
+                    raise SystemExit(f"wrong body for {path}")
+        elapsed = time.perf_counter() - start
+
+        stats = cache.stats()
+        print(f"{args.rounds * len(paths)} requests in {elapsed:.2f}s: {StubHandler.full_responses} full responses, "
+              f"{StubHandler.not_modified} not modified, {StubHandler.bytes_sent // 1024} KB sent")
+        print(f"hit rate {stats['hit_rate']:.2f} ({stats['fresh_hits']} fresh, {stats['revalidated']} revalidated, "
+              f"{stats['misses']} misses), {stats['entries']} entries in {stats['bytes']} bytes "
+              f"for {len(PAGE)} byte pages")
+
+        # One download each for max-age, etag and last-modified, every round for no-store
+        expected_full = 3 + args.rounds
+        if StubHandler.full_responses != expected_full or stats["revalidated"] != 2 * (args.rounds - 1):
+            raise SystemExit(f"expected {expected_full} full responses and {2 * (args.rounds - 1)} revalidations")
+
+        # A cap smaller than two compressed pages keeps only the most recent one
+        small = HttpCache(tempfile.mkdtemp(dir=folder), max_bytes=stats['bytes'] // 2)
+        for path in ['/max-age?a', '/max-age?b', '/max-age?c']:
+            small.get(base + path, send)
+        if small.stats()["entries"] != 1:
+            raise SystemExit("size cap did not evict older pages")
+        print("eviction keeps the cache under its size cap")
+    finally:
+        server.shutdown()
+        shutil.rmtree(folder, ignore_errors=True)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,76 @@
+"""Compare the old per-chunk thread fan-out in pdf_analyzer with the batched
+search over a precomputed chunk matrix.
+
+Run from the server folder:
+    python -m benchmarks.bench_retrieval --extracted uploads/extracted_text.json
+"""
+import argparse
+import time
+from concurrent.futures import ThreadPoolExecutor
+from sentence_transformers import util
+from pdf_analyzer import load_text_from_file, build_chunk_matrix, retrieve_relevant_context
+from chunking import chunk_text
+from retrieval import RetrievalEngine
+
+DEFAULT_QUERIES = [
+    "What is the main idea of the document?",
+    "Which methods are proposed?",
+    "What are the limitations?",
+    "How is the work evaluated?",
+    "What are the conclusions?"
+]
+
+def fan_out_retrieve(query, text_chunks, retriever_model):
+    """The previous process_chunks: one single-chunk retrieval per thread"""
+    def retrieve(chunk):
+        query_embedding = retriever_model.encode(query, convert_to_tensor=True)
+        chunk_embeddings = retriever_model.encode([chunk["text"]], convert_to_tensor=True)
+        scores = util.pytorch_cos_sim(query_embedding, chunk_embeddings)[0]
+        return [chunk for _ in scores.topk(k=1).indices]
+
+    with ThreadPoolExecutor() as executor:
+        relevant_contexts = list(executor.map(retrieve, text_chunks))
+    return [chunk for sublist in relevant_contexts for chunk in sublist]
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--extracted", default="uploads/extracted_text.json", help="extracted_text.json to chunk")
+    parser.add_argument("--repeat", type=int, default=3, help="passes over the query list")
+    parser.add_argument("--replicate", type=int, default=1, help="repeat the document to simulate a longer one")
+    args = parser.parse_args()
+
+    extracted_text = load_text_from_file(args.extracted) * args.replicate
+    queries = DEFAULT_QUERIES * args.repeat
+
+    engine = RetrievalEngine('all-mpnet-base-v2')
+    retriever_model = engine.model
+    text_chunks = chunk_text(extracted_text, tokenizer=engine.tokenizer, max_tokens=engine.max_tokens)
+    print(f"{len(text_chunks)} chunks, {len(queries)} questions, device {engine.device}")
+
+    # Warm up both paths once so model initialisation isn't timed
+    fan_out_retrieve(queries[0], text_chunks[:1], retriever_model)
+    engine.encode([queries[0]])
+
+    start = time.perf_counter()
+    for query in queries:
+        fan_out_retrieve(query, text_chunks, retriever_model)
+    fan_out_seconds = time.perf_counter() - start
+
+    start = time.perf_counter()
+    chunk_matrix = build_chunk_matrix(text_chunks, engine)
+    build_seconds = time.perf_counter() - start
+
+    start = time.perf_counter()
+    for query in queries:
+        retrieve_relevant_context(query, text_chunks, engine, chunk_matrix)
+    batched_seconds = time.perf_counter() - start
+
+    per_query_fan_out = fan_out_seconds / len(queries) * 1000
+    per_query_batched = batched_seconds / len(queries) * 1000
+    print(f"fan-out:  {per_query_fan_out:9.1f} ms/question")
+    print(f"batched:  {per_query_batched:9.1f} ms/question (+ {build_seconds * 1000:.1f} ms one-off matrix build)")
+    print(f"speedup:  {per_query_fan_out / per_query_batched:9.1f}x per question, "
+          f"{fan_out_seconds / (batched_seconds + build_seconds):.1f}x including the build")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,83 @@
+"""Time page analysis over saved HTML fixtures: the previous two parses with
+html.parser (one for the text, one for the metadata) against the single
+parse of ContentScraper.analyze_page with each available backend, for both
+the server scraper and client/src/assets/scrape.py.
+
+Run from the server folder:
+    python -m benchmarks.bench_scrape --repeat 200
+"""
+import argparse
+import glob
+import importlib.util
+import os
+import time
+from bs4 import BeautifulSoup
+import app
+
+FIXTURES = os.path.join(os.path.dirname(__file__), 'fixtures')
+CLIENT_SCRAPER = os.path.join(os.path.dirname(__file__), '..', '..', 'client', 'src', 'assets', 'scrape.py')
+
+def load_client_module():
+    spec = importlib.util.spec_from_file_location('client_scrape', CLIENT_SCRAPER)
+    module = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(module)
+    return module
+
+def available_parsers():
+    parsers = ['html.parser']
+    if importlib.util.find_spec('lxml'):
+        parsers.append('lxml')
+    return parsers
+
+def two_parses(scraper, html: str, url: str):
+    """What search_materials did before: a separate html.parser tree for text and metadata"""
+    text = scraper._text_from_soup(BeautifulSoup(html, 'html.parser'))
+    meta = scraper._meta_from_soup(BeautifulSoup(html, 'html.parser'), url)
+    return {**meta, "text": text}
+
+def time_pages(analyze, pages, repeat: int) -> float:
+    start = time.perf_counter()
+    for _ in range(repeat):
+        for url, html in pages:
+            analyze(html, url)
+    return (time.perf_counter() - start) / (repeat * len(pages)) * 1000
+
+def run(label: str, module, pages, repeat: int):
+    scraper = module.ContentScraper()
+    baseline = time_pages(lambda html, url: two_parses(scraper, html, url), pages, repeat)
+    print(f"{label}: two html.parser parses {baseline:.2f} ms/page")
+
+    default_parser = module.HTML_PARSER
+    try:
+        for parser in available_parsers():
+            module.HTML_PARSER = parser
+            for url, html in pages:
+                expected, page = two_parses(scraper, html, url), scraper.analyze_page(html, url)
+                if parser == 'html.parser' and page != expected:
+                    raise SystemExit(f"{label}: analyze_page disagrees with the two parses on {url}")
+            single = time_pages(scraper.analyze_page, pages, repeat)
+            print(f"{label}: analyze_page with {parser} {single:.2f} ms/page ({baseline / single:.1f}x)")
+    finally:
+        module.HTML_PARSER = default_parser
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--fixtures", default=FIXTURES, help="folder of saved .html pages")
+    parser.add_argument("--repeat", type=int, default=100, help="passes over the fixtures")
+    parser.add_argument("--skip-client", action="store_true", help="only time the server scraper")
+    args = parser.parse_args()
+
+    pages = []
+    for path in sorted(glob.glob(os.path.join(args.fixtures, '*.html'))):
+        with open(path, encoding='utf-8') as f:
+            pages.append((f"https://example.com/learn/{os.path.basename(path)}", f.read()))
+    if not pages:
+        raise SystemExit(f"No .html fixtures in {args.fixtures}")
+    print(f"{len(pages)} pages, {sum(len(html) for _, html in pages) // 1024} KB")
+
+    run("server", app, pages, args.repeat)
+    if not args.skip_client:
+        run("client", load_client_module(), pages, args.repeat)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,62 @@
+"""Check how many cached summary windows survive a one-page edit.
+
+Builds a synthetic document, inserts sentences into one page and counts the
+map windows whose text is unchanged (and so reused from the summary cache),
+for the page-anchored page_windows used by the summarizer and for plain
+chunk_text windows packed across pages. Every window outside the edited
+page's run (and the next run, when the edit moves a boundary) must be reused.
+
+Run from the server folder:
+    python -m benchmarks.bench_summary_windows --pages 40 --edit-page 1
+"""
+import argparse
+import random
+from chunking import _ends_window, chunk_text, page_windows
+
+WORDS = ("recursion tree graph node edge value list array sort search index "
+         "memory cache thread process queue stack heap pointer loop function").split()
+
+def synthetic_pages(count: int, seed: int = 0):
+    rng = random.Random(seed)
+    def sentence():
+        return " ".join(rng.choice(WORDS) for _ in range(rng.randint(8, 20))).capitalize() + "."
+    return [{"page": page, "text": " ".join(sentence() for _ in range(rng.randint(10, 30)))}
+            for page in range(1, count + 1)], sentence
+
+def reused(before, after):
+    previous = set(before)
+    return sum(1 for text in after if text in previous)
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--pages", type=int, default=40)
+    parser.add_argument("--edit-page", type=int, default=1, help="page the sentences are inserted into")
+    parser.add_argument("--sentences", type=int, default=8, help="sentences inserted")
+    parser.add_argument("--max-tokens", type=int, default=1024)
+    args = parser.parse_args()
+
+    pages, sentence = synthetic_pages(args.pages)
+    edited = [dict(page) for page in pages]
+    target = edited[args.edit_page - 1]
+    target["text"] = " ".join(sentence() for _ in range(args.sentences)) + " " + target["text"]
+
+    packed = [[chunk.text for chunk in chunk_text(doc, max_tokens=args.max_tokens, overlap_tokens=0)]
+              for doc in (pages, edited)]
+    print(f"chunk_text windows: {reused(*packed)} of {len(packed[1])} reused")
+
+    before, after = page_windows(pages, max_tokens=args.max_tokens), page_windows(edited, max_tokens=args.max_tokens)
+    print(f"page_windows: {reused([w['text'] for w in before], [w['text'] for w in after])} of {len(after)} reused")
+
+    # The run holding the edited page lies between the boundary pages around
+    # it; if the edit moves the page's own boundary, the next run joins in
+    boundaries = [page["page"] for page in pages if page["page"] != args.edit_page and _ends_window(page["text"], 4)]
+    run_start = max([page for page in boundaries if page < args.edit_page], default=0)
+    run_end = min([page for page in boundaries if page > args.edit_page], default=args.pages)
+    outside = [w["text"] for w in before if w["end_page"] <= run_start or w["page"] > run_end]
+    missing = set(outside) - {w["text"] for w in after}
+    if missing:
+        raise SystemExit(f"{len(missing)} windows outside pages {run_start + 1}-{run_end} were not reused")
+    print(f"only the windows of pages {run_start + 1}-{run_end} changed")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,32 @@
+"""Rebuild the course library index outside the web server.
+
+Reads the indexes of every uploaded document, builds the library index and
+swaps it in; running servers pick it up on their next /library/query.
+Prefer this over POST /library/build for large libraries, for example from
+cron after a batch of uploads.
+
+Run from the server folder:
+    python build_library.py --index ivf --nprobe 16
+"""
+import argparse
+import json
+from app import course_library
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--index", choices=["exact", "ivf"], help="index type, ALIMER_LIBRARY_INDEX by default")
+    parser.add_argument("--nlist", type=int, help="IVF cells, about 4 * sqrt(chunks) by default")
+    parser.add_argument("--nprobe", type=int, help="IVF cells searched per query")
+    parser.add_argument("--dtype", choices=["float16", "float32"], help="IVF vector storage")
+    args = parser.parse_args()
+
+    if args.index:
+        course_library.kind = args.index
+    options = {name: value for name, value in
+               {"nlist": args.nlist, "nprobe": args.nprobe, "dtype": args.dtype}.items() if value is not None}
+    if options and course_library.kind != 'ivf':
+        parser.error("--nlist, --nprobe and --dtype only apply to the ivf index")
+    print(json.dumps(course_library.build(**options), indent=4))
+
+if __name__ == "__main__":
+    main()
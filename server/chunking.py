@@ -0,0 +1,200 @@
+import hashlib
+import re
+from bisect import bisect_left, bisect_right
+from typing import Dict, List, Tuple
+
+# all-mpnet-base-v2 truncates at 384 tokens, two of which are special tokens
+DEFAULT_MAX_TOKENS = 382
+DEFAULT_OVERLAP_TOKENS = 64
+
+# A sentence ends at ., ! or ? followed by whitespace, or at a blank line
+SENTENCE_END = re.compile(r'(?<=[.!?])\s+|\n\s*\n')
+# Rough stand-in for a subword tokenizer when none is given
+APPROXIMATE_TOKEN = re.compile(r'\w+|[^\w\s]')
+
+class TextBuffer:
+    """The text of every page joined into one string, with the offset each page starts at"""
+    __slots__ = ('text', 'page_starts', 'pages')
+
+    def __init__(self, text: str, page_starts: List[int], pages: List[int]):
+        self.text = text
+        self.page_starts = page_starts
+        self.pages = pages
+
+    @classmethod
+    def from_pages(cls, text_data: List[Dict]) -> 'TextBuffer':
+        parts, page_starts, pages = [], [], []
+        offset = 0
+        for entry in text_data:
+            page_starts.append(offset)
+            pages.append(entry["page"])
+            parts.append(entry["text"])
+            offset += len(entry["text"]) + 1
+        return cls("\n".join(parts), page_starts, pages)
+
+    def page_at(self, offset: int) -> int:
+        return self.pages[max(0, bisect_right(self.page_starts, offset) - 1)]
+
+CHUNK_FIELDS = ('text', 'page', 'end_page', 'start', 'end', 'token_count')
+
+class Chunk:
+    """A view of [start, end) in a shared TextBuffer.
+
+    Supports chunk["text"] and chunk["page"] like the dicts chunk_text used to
+    return, but only slices the buffer when the text is actually read.
+    """
+    __slots__ = ('buffer', 'start', 'end', 'page', 'end_page', 'token_count')
+
+    def __init__(self, buffer: TextBuffer, start: int, end: int, token_count: int):
+        self.buffer = buffer
+        self.start = start
+        self.end = end
+        self.page = buffer.page_at(start)
+        self.end_page = buffer.page_at(max(start, end - 1))
+        self.token_count = token_count
+
+    @property
+    def text(self) -> str:
+        return self.buffer.text[self.start:self.end]
+
+    def __getitem__(self, key):
+        if key in CHUNK_FIELDS:
+            return getattr(self, key)
+        raise KeyError(key)
+
+    def get(self, key, default=None):
+        try:
+            return self[key]
+        except KeyError:
+            return default
+
+    def to_dict(self) -> Dict:
+        return {
+            "page": self.page,
+            "end_page": self.end_page,
+            "start": self.start,
+            "end": self.end,
+            "text": self.text
+        }
+
+    def __repr__(self):
+        return f"Chunk(pages={self.page}-{self.end_page}, chars={self.start}:{self.end}, tokens={self.token_count})"
+
+def _token_spans(text: str, tokenizer) -> Tuple[List[int], List[int]]:
+    """Start and end character offsets of every token in text"""
+    if tokenizer is None:
+        matches = list(APPROXIMATE_TOKEN.finditer(text))
+        return [m.start() for m in matches], [m.end() for m in matches]
+
+    encoding = tokenizer(text, add_special_tokens=False, return_offsets_mapping=True, verbose=False)
+    offsets = encoding["offset_mapping"]
+    return [start for start, _ in offsets], [end for _, end in offsets]
+
+def _sentence_spans(text: str) -> List[Tuple[int, int]]:
+    spans = []
+    start = 0
+    for match in SENTENCE_END.finditer(text):
+        if match.start() > start:
+            spans.append((start, match.start()))
+        start = match.end()
+    if start < len(text):
+        spans.append((start, len(text)))
+    return spans
+
+def chunk_text(text_data: List[Dict], tokenizer=None, max_tokens: int = DEFAULT_MAX_TOKENS,
+               overlap_tokens: int = DEFAULT_OVERLAP_TOKENS) -> List[Chunk]:
+    """Split pages into chunks of at most max_tokens tokens, breaking at sentence boundaries.
+
+    Token counts come from the embedding model's tokenizer (pass
+    model.tokenizer) so no chunk is silently truncated when encoded; without
+    one, words and punctuation are counted instead. Chunks may span pages and
+    consecutive chunks share up to overlap_tokens tokens of whole sentences.
+    """
+    buffer = TextBuffer.from_pages(text_data)
+    if not buffer.text.strip():
+        return []
+
+    token_starts, token_ends = _token_spans(buffer.text, tokenizer)
+
+    # Each unit is a sentence, or a max_tokens slice of a sentence that is too long
+    units = []
+    for start, end in _sentence_spans(buffer.text):
+        first = bisect_left(token_starts, start)
+        last = bisect_left(token_starts, end)
+        if last - first <= max_tokens:
+            if last > first:
+                units.append((start, end, last - first))
+            continue
+        for piece in range(first, last, max_tokens):
+            piece_end = min(piece + max_tokens, last)
+            units.append((token_starts[piece], token_ends[piece_end - 1], piece_end - piece))
+
+    chunks = []
+    current: List[Tuple[int, int, int]] = []
+    current_tokens = 0
+    for unit in units:
+        if current and current_tokens + unit[2] > max_tokens:
+            chunks.append(Chunk(buffer, current[0][0], current[-1][1], current_tokens))
+
+            # Carry trailing sentences over as overlap, as long as the next unit still fits
+            carried, carried_tokens = [], 0
+            for previous in reversed(current):
+                if carried_tokens + previous[2] > overlap_tokens or carried_tokens + previous[2] + unit[2] > max_tokens:
+                    break
+                carried.insert(0, previous)
+                carried_tokens += previous[2]
+            current, current_tokens = carried, carried_tokens
+
+        current.append(unit)
+        current_tokens += unit[2]
+
+    if current:
+        chunks.append(Chunk(buffer, current[0][0], current[-1][1], current_tokens))
+    return chunks
+
+def _ends_window(text: str, pages_per_window: int) -> bool:
+    """Whether a page closes its summary window, decided by its own content only"""
+    digest = hashlib.sha256(text.encode('utf-8')).digest()
+    return int.from_bytes(digest[:4], 'big') % pages_per_window == 0
+
+def page_windows(text_data: List[Dict], tokenizer=None, max_tokens: int = 1024,
+                 pages_per_window: int = 4) -> List[Dict]:
+    """Group pages into windows of at most max_tokens tokens for summarizing.
+
+    Windows are anchored to pages: a window ends after any page whose content
+    hash marks it as a boundary (about one page in pages_per_window), and a
+    run of pages between two boundaries is only split further at page breaks
+    when it doesn't fit. Pages longer than max_tokens are chunked on their
+    own. Editing a page therefore only changes the windows of its own run
+    (and of the next run when the edit moves a boundary), unlike chunk_text,
+    where every window after the edit shifts.
+    """
+    windows = []
+
+    def close_run(run):
+        current, current_tokens = [], 0
+        for chunk in run:
+            if current and current_tokens + chunk.token_count > max_tokens:
+                windows.append(_window(current))
+                current, current_tokens = [], 0
+            current.append(chunk)
+            current_tokens += chunk.token_count
+        if current:
+            windows.append(_window(current))
+
+    run = []
+    for entry in text_data:
+        chunks = chunk_text([entry], tokenizer=tokenizer, max_tokens=max_tokens, overlap_tokens=0)
+        run.extend(chunks)
+        if chunks and _ends_window(entry["text"], pages_per_window):
+            close_run(run)
+            run = []
+    close_run(run)
+    return windows
+
+def _window(chunks: List[Chunk]) -> Dict:
+    return {"page": chunks[0].page, "end_page": chunks[-1].end_page, "text": "\n".join(chunk.text for chunk in chunks)}
+
+def chunks_to_dicts(chunks: List[Chunk]) -> List[Dict]:
+    """Plain dict copies of chunks, for persisting or sending as JSON"""
+    return [chunk.to_dict() if isinstance(chunk, Chunk) else dict(chunk) for chunk in chunks]
@@ -0,0 +1,57 @@
+from typing import Dict, Optional, Sequence
+import numpy as np
+
+CONFIDENCE_LEVELS = np.array(["Low", "Medium", "High"])
+
+def scores_from_totals(total_questions: np.ndarray, correct_answers: np.ndarray,
+                       weighted_difficulty_score: np.ndarray, total_difficulty: np.ndarray) -> np.ndarray:
+    """CompetenceScoreCalculator.score_from_totals over whole arrays of groups"""
+    total_questions = total_questions.astype(np.float64)
+    answered = total_questions > 0
+    safe_total = np.where(answered, total_questions, 1)
+    safe_difficulty = np.where(total_difficulty > 0, total_difficulty, 1)
+
+    accuracy = correct_answers / safe_total
+    accuracy_weight = np.minimum(0.6, 0.4 + total_questions / 100)
+    difficulty_weight = 1 - accuracy_weight
+
+    raw_score = (accuracy * accuracy_weight + (weighted_difficulty_score / safe_difficulty) * difficulty_weight) * 100
+    final_score = 100 / (1 + np.power(2.71828, -0.1 * (raw_score - 50)))
+    return np.where(answered, np.round(final_score, 2), 0)
+
+def confidence_from_counts(total_questions: np.ndarray) -> np.ndarray:
+    """CompetenceScoreCalculator.confidence_for_count over an array, as level names"""
+    return CONFIDENCE_LEVELS[np.searchsorted([5, 20], total_questions, side='right')]
+
+def bulk_competence(student_ids: Sequence, topics: Sequence, difficulty: Sequence, is_correct: Sequence,
+                    quality_score: Optional[Sequence] = None) -> Dict[str, np.ndarray]:
+    """Competence of every (student, topic) pair found in columnar response data.
+
+    The inputs are parallel columns with one entry per answer. Answers are
+    grouped with np.unique and summed with np.bincount, so the whole class is
+    scored in a handful of array passes. Returns columns with one entry per
+    group, sorted by student and then topic.
+    """
+    students, student_index = np.unique(np.asarray(student_ids), return_inverse=True)
+    topic_names, topic_index = np.unique(np.asarray(topics), return_inverse=True)
+    groups, group_index = np.unique(student_index.astype(np.int64) * len(topic_names) + topic_index,
+                                    return_inverse=True)
+
+    difficulty = np.asarray(difficulty, dtype=np.float64)
+    correct = np.asarray(is_correct, dtype=bool)
+    quality = np.ones(len(difficulty)) if quality_score is None else np.asarray(quality_score, dtype=np.float64)
+
+    count = len(groups)
+    total_questions = np.bincount(group_index, minlength=count)
+    correct_answers = np.bincount(group_index, weights=correct, minlength=count).astype(np.int64)
+    weighted_difficulty = np.bincount(group_index, weights=np.where(correct, difficulty * quality, 0), minlength=count)
+    total_difficulty = np.bincount(group_index, weights=difficulty, minlength=count)
+
+    return {
+        "student_id": students[groups // len(topic_names)],
+        "topic": topic_names[groups % len(topic_names)],
+        "competence_score": scores_from_totals(total_questions, correct_answers, weighted_difficulty, total_difficulty),
+        "confidence_level": confidence_from_counts(total_questions),
+        "total_questions": total_questions,
+        "correct_answers": correct_answers
+    }
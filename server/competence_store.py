@@ -0,0 +1,113 @@
+import os
+import sqlite3
+import threading
+import time
+from typing import Dict, Iterable, List, Optional, Tuple
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS topic_competence (
+    user_id TEXT NOT NULL,
+    topic TEXT NOT NULL,
+    responses INTEGER NOT NULL,
+    correct INTEGER NOT NULL,
+    total_difficulty INTEGER NOT NULL,
+    weighted_difficulty REAL NOT NULL,
+    last_updated REAL NOT NULL,
+    PRIMARY KEY (user_id, topic)
+)
+"""
+
+COLUMNS = ('user_id', 'topic', 'responses', 'correct', 'total_difficulty', 'weighted_difficulty', 'last_updated')
+
+class CompetenceStore:
+    """Running per-student, per-topic answer totals in SQLite.
+
+    Only the sums the competence score is computed from are kept (answers,
+    correct answers, summed difficulty and summed difficulty * quality of the
+    correct ones), so recording an answer is a single upsert no matter how
+    long the student's history is.
+    """
+    def __init__(self, path: str):
+        self.path = path
+        folder = os.path.dirname(path)
+        if folder:
+            os.makedirs(folder, exist_ok=True)
+        self._local = threading.local()
+        # The store is created at import, possibly in a preloading master
+        # that forks workers afterwards; a SQLite connection must not cross
+        # fork(), so this one is closed instead of kept
+        connection = self._connect()
+        try:
+            with connection:
+                connection.execute(SCHEMA)
+        finally:
+            connection.close()
+
+    def _connect(self) -> sqlite3.Connection:
+        connection = sqlite3.connect(self.path, timeout=30)
+        connection.execute('PRAGMA journal_mode=WAL')
+        connection.execute('PRAGMA synchronous=NORMAL')
+        return connection
+
+    def _connection(self) -> sqlite3.Connection:
+        # One connection per thread and process; WAL lets readers run while a
+        # write is in progress. The pid check keeps a forked child from
+        # reusing a connection opened by its parent's thread
+        connection = getattr(self._local, 'connection', None)
+        if connection is None or self._local.pid != os.getpid():
+            connection = self._connect()
+            self._local.connection = connection
+            self._local.pid = os.getpid()
+        return connection
+
+    def record(self, user_id: str, topic: str, responses: Iterable[Tuple[int, bool, float]]) -> Dict:
+        """Add (difficulty, is_correct, quality_score) answers and return the updated totals"""
+        count = correct = total_difficulty = 0
+        weighted_difficulty = 0.0
+        for difficulty, is_correct, quality_score in responses:
+            count += 1
+            total_difficulty += difficulty
+            if is_correct:
+                correct += 1
+                weighted_difficulty += difficulty * quality_score
+
+        with self._connection() as connection:
+            connection.execute(
+                """
+                INSERT INTO topic_competence VALUES (?, ?, ?, ?, ?, ?, ?)
+                ON CONFLICT (user_id, topic) DO UPDATE SET
+                    responses = responses + excluded.responses,
+                    correct = correct + excluded.correct,
+                    total_difficulty = total_difficulty + excluded.total_difficulty,
+                    weighted_difficulty = weighted_difficulty + excluded.weighted_difficulty,
+                    last_updated = excluded.last_updated
+                """,
+                (user_id, topic, count, correct, total_difficulty, weighted_difficulty, time.time())
+            )
+            row = connection.execute(
+                "SELECT * FROM topic_competence WHERE user_id = ? AND topic = ?", (user_id, topic)
+            ).fetchone()
+        return dict(zip(COLUMNS, row))
+
+    def get(self, user_id: str, topic: str) -> Optional[Dict]:
+        row = self._connection().execute(
+            "SELECT * FROM topic_competence WHERE user_id = ? AND topic = ?", (user_id, topic)
+        ).fetchone()
+        return dict(zip(COLUMNS, row)) if row else None
+
+    def topics(self, user_id: str) -> List[Dict]:
+        rows = self._connection().execute(
+            "SELECT * FROM topic_competence WHERE user_id = ? ORDER BY topic", (user_id,)
+        ).fetchall()
+        return [dict(zip(COLUMNS, row)) for row in rows]
+
+    def reset(self, user_id: str, topic: Optional[str] = None) -> int:
+        """Forget a student's totals for one topic, or for all of them"""
+        with self._connection() as connection:
+            if topic is None:
+                cursor = connection.execute("DELETE FROM topic_competence WHERE user_id = ?", (user_id,))
+            else:
+                cursor = connection.execute(
+                    "DELETE FROM topic_competence WHERE user_id = ? AND topic = ?", (user_id, topic)
+                )
+        return cursor.rowcount
@@ -0,0 +1,333 @@
+import json
+import os
+import re
+import threading
+from typing import Callable, Dict, List, Optional
+import numpy as np
+
+LEVELS = 5
+# Function words and everyday vocabulary; the share of words outside this
+# list stands in for vocabulary rarity
+COMMON_WORDS = frozenset("""
+a about above after again all also always an and another any are around as at back be because been before
+being below between both but by came can come could day did different do does down during each even every
+few find first for found from get give go good great had has have he her here him his how i if in into is
+it its just know large last little long look made make man many may me more most much must my never new
+no not now number of off often old on one only or other our out over own part people place put right said
+same say see she should show small so some something still such take than that the their them then there
+these they thing think this those three through time to too two under up us use used very want was water
+way we well went were what when where which while who why will with without word work world would write
+year you your learn example examples simple basic first second next using start started easy like also help
+""".split())
+
+# The page embedding is reduced to this many principal components before the
+# regression, so a few hundred labelled pages are enough to fit it
+EMBEDDING_COMPONENTS = 16
+
+FEATURE_NAMES = ['sentence_length', 'syllables_per_word', 'polysyllable_ratio', 'rare_word_ratio',
+                 'type_token_ratio', 'grade_level']
+WORD_PATTERN = re.compile(r"[A-Za-z][A-Za-z'-]*")
+VOWEL_GROUPS = re.compile(r'[aeiouy]+')
+
+def count_syllables(word: str) -> int:
+    """Vowel groups, less a silent final e; good enough for readability scores"""
+    word = word.lower()
+    count = len(VOWEL_GROUPS.findall(word))
+    if word.endswith('e') and not word.endswith(('le', 'ee')) and count > 1:
+        count -= 1
+    return max(1, count)
+
+def readability_features(sentences: List[str]) -> np.ndarray:
+    """FEATURE_NAMES for a text already split into sentences"""
+    words = [word.lower() for sentence in sentences for word in WORD_PATTERN.findall(sentence)]
+    if not words:
+        return np.zeros(len(FEATURE_NAMES), dtype=np.float32)
+
+    syllables = np.array([count_syllables(word) for word in words])
+    sentence_length = len(words) / max(1, len(sentences))
+    syllables_per_word = float(syllables.mean())
+    # Flesch-Kincaid grade level
+    grade_level = 0.39 * sentence_length + 11.8 * syllables_per_word - 15.59
+    return np.array([
+        sentence_length,
+        syllables_per_word,
+        float((syllables >= 3).mean()),
+        sum(1 for word in words if word not in COMMON_WORDS) / len(words),
+        len(set(words)) / len(words),
+        grade_level
+    ], dtype=np.float32)
+
+def _softmax(logits: np.ndarray) -> np.ndarray:
+    logits = logits - logits.max(axis=1, keepdims=True)
+    exp = np.exp(logits)
+    return exp / exp.sum(axis=1, keepdims=True)
+
+class ComplexityClassifier:
+    """Local first tier for page complexity, in front of the LLM.
+
+    Pages are described by readability features and the leading principal
+    components of their SentenceTransformer embedding, and a softmax
+    regression over those predicts the 1-5 level. Every page that still goes
+    to the LLM becomes a labelled example, and the model is refitted each
+    retrain_every new examples; until min_examples have been seen nothing is
+    predicted and everything is escalated. The held-out examples are split
+    in two: a temperature fitted on one half calibrates the confidence, and
+    the report the threshold is judged by is measured on the other, so only
+    predictions at or above threshold are trusted.
+    """
+    def __init__(self, folder: str, embed: Optional[Callable[[List[str]], np.ndarray]] = None,
+                 threshold: float = 0.8, min_examples: int = 200, retrain_every: int = 50,
+                 holdout: float = 0.3, seed: int = 0):
+        self.folder = folder
+        self.embed = embed
+        self.threshold = threshold
+        self.min_examples = min_examples
+        self.retrain_every = retrain_every
+        self.holdout = holdout
+        self.seed = seed
+        self._lock = threading.Lock()
+        self._fit_lock = threading.Lock()
+        self._model: Optional[Dict[str, np.ndarray]] = None
+        self._report: Dict = {}
+        self._examples: List[np.ndarray] = []
+        self._labels: List[int] = []
+        self._ids: List[str] = []
+        self._seen = set()
+        self._unsaved = 0
+        self._since_fit = 0
+        self._stats = {"local": 0, "escalated": 0}
+        os.makedirs(folder, exist_ok=True)
+        self._load()
+
+    @property
+    def trained(self) -> bool:
+        return self._model is not None
+
+    def features(self, sentences: List[str], sample_text: Optional[str] = None) -> np.ndarray:
+        """One feature row: readability features of the sentences, then the
+        embedding of sample_text (or of the sentences) if there is a model for it"""
+        readability = readability_features(sentences)
+        if self.embed is None:
+            return readability
+        embedding = np.asarray(self.embed([sample_text or ' '.join(sentences)]), dtype=np.float32).reshape(-1)
+        return np.concatenate([readability, embedding])
+
+    def predict(self, features: np.ndarray) -> Optional[Dict]:
+        """The local assessment, or None when no model has been fitted yet"""
+        with self._lock:
+            model = self._model
+        if model is None or len(features) != len(model["mean"]):
+            return None
+
+        probabilities = self._probabilities(model, features[None, :])[0]
+        level = int(probabilities.argmax()) + 1
+        return {
+            "complexity_level": level,
+            "confidence": round(float(probabilities.max()), 3),
+            "factors": {
+                **{name: round(float(value), 3) for name, value in zip(FEATURE_NAMES, features)},
+                "assessed_by": "local"
+            }
+        }
+
+    def record_outcome(self, handled_locally: bool):
+        with self._lock:
+            self._stats["local" if handled_locally else "escalated"] += 1
+
+    def observe(self, features: np.ndarray, level: int, example_id: str):
+        """Add an LLM-labelled example, refitting every retrain_every new examples.
+
+        example_id identifies the page text, so a page seen again (its
+        assessment then comes from the cache) is not counted twice.
+        """
+        with self._lock:
+            if example_id in self._seen:
+                return
+            self._seen.add(example_id)
+            self._ids.append(example_id)
+            self._examples.append(np.asarray(features, dtype=np.float32))
+            self._labels.append(int(level))
+            self._unsaved += 1
+            self._since_fit += 1
+            count = len(self._labels)
+            refit = count >= self.min_examples and (self._model is None or self._since_fit >= self.retrain_every)
+        if refit:
+            self.fit()
+        elif self._unsaved >= 10:
+            self._save_examples()
+
+    def fit(self) -> Dict:
+        """Fit on the collected examples and return the calibration report"""
+        with self._fit_lock:
+            return self._fit()
+
+    def _fit(self) -> Dict:
+        with self._lock:
+            widths = {len(example) for example in self._examples}
+            if len(widths) > 1:
+                # The embedding model changed; only the newest width is usable
+                width = len(self._examples[-1])
+                kept = [(x, y, i) for x, y, i in zip(self._examples, self._labels, self._ids) if len(x) == width]
+                self._examples = [x for x, _, _ in kept]
+                self._labels = [y for _, y, _ in kept]
+                self._ids = [i for _, _, i in kept]
+            if len(self._labels) < self.min_examples:
+                return {"trained": False, "examples": len(self._labels), "min_examples": self.min_examples}
+            self._since_fit = 0
+            features = np.stack(self._examples)
+            labels = np.array(self._labels) - 1
+
+        rng = np.random.default_rng(self.seed)
+        order = rng.permutation(len(labels))
+        split = max(2, int(len(labels) * self.holdout))
+        # Calibrating and evaluating on the same pages would overstate calibration
+        calibration, test, train = order[:split // 2], order[split // 2:split], order[split:]
+
+        model = self._train(features[train], labels[train])
+        model["temperature"] = np.array(self._fit_temperature(model, features[calibration], labels[calibration]))
+        report = self._evaluate(model, features[test], labels[test])
+        report.update({"trained": True, "examples": len(labels), "train_examples": len(train),
+                       "calibration_examples": len(calibration)})
+
+        with self._lock:
+            self._model = model
+            self._report = report
+        self._save(model, report)
+        return report
+
+    @staticmethod
+    def _train(features: np.ndarray, labels: np.ndarray, iterations: int = 300, learning_rate: float = 0.5,
+               l2: float = 1e-2) -> Dict[str, np.ndarray]:
+        """Softmax regression by full-batch gradient descent on standardized
+        readability features and the top principal components of the embedding"""
+        mean = features.mean(axis=0)
+        std = features.std(axis=0) + 1e-6
+        x = (features - mean) / std
+
+        # Readability features pass through; the embedding columns are projected
+        # onto their EMBEDDING_COMPONENTS leading principal components
+        readability = len(FEATURE_NAMES)
+        components = min(EMBEDDING_COMPONENTS, x.shape[1] - readability, len(x))
+        projection = np.zeros((x.shape[1], readability + components))
+        projection[:readability, :readability] = np.eye(readability)
+        if components > 0:
+            _, _, vt = np.linalg.svd(x[:, readability:], full_matrices=False)
+            projection[readability:, readability:] = vt[:components].T
+        x = x @ projection
+
+        targets = np.eye(LEVELS)[labels]
+        weights = np.zeros((x.shape[1], LEVELS))
+        bias = np.zeros(LEVELS)
+        for _ in range(iterations):
+            error = (_softmax(x @ weights + bias) - targets) / len(x)
+            weights -= learning_rate * (x.T @ error + l2 * weights)
+            bias -= learning_rate * error.sum(axis=0)
+        return {"mean": mean, "std": std, "projection": projection, "weights": weights, "bias": bias,
+                "temperature": np.array(1.0)}
+
+    @staticmethod
+    def _logits(model: Dict[str, np.ndarray], features: np.ndarray) -> np.ndarray:
+        x = (features - model["mean"]) / model["std"]
+        # Models saved before the projection was added use every column as is
+        if "projection" in model:
+            x = x @ model["projection"]
+        return x @ model["weights"] + model["bias"]
+
+    def _probabilities(self, model: Dict[str, np.ndarray], features: np.ndarray) -> np.ndarray:
+        return _softmax(self._logits(model, features) / float(model["temperature"]))
+
+    def _fit_temperature(self, model: Dict[str, np.ndarray], features: np.ndarray, labels: np.ndarray) -> float:
+        """The temperature with the lowest held-out negative log likelihood"""
+        logits = self._logits(model, features)
+        best, best_loss = 1.0, np.inf
+        for temperature in np.geomspace(0.25, 8, 41):
+            probabilities = _softmax(logits / temperature)
+            loss = -np.log(probabilities[np.arange(len(labels)), labels] + 1e-12).mean()
+            if loss < best_loss:
+                best, best_loss = float(temperature), loss
+        return best
+
+    def _evaluate(self, model: Dict[str, np.ndarray], features: np.ndarray, labels: np.ndarray,
+                  bins: int = 5) -> Dict:
+        """How the local tier agrees with the LLM labels on held-out pages not used for calibration"""
+        probabilities = self._probabilities(model, features)
+        predicted = probabilities.argmax(axis=1)
+        confidence = probabilities.max(axis=1)
+        correct = predicted == labels
+        confident = confidence >= self.threshold
+
+        reliability = []
+        edges = np.linspace(1 / LEVELS, 1, bins + 1)
+        for low, high in zip(edges[:-1], edges[1:]):
+            in_bin = (confidence >= low) & ((confidence < high) | (high == 1))
+            if in_bin.any():
+                reliability.append({
+                    "confidence": [round(float(low), 2), round(float(high), 2)],
+                    "pages": int(in_bin.sum()),
+                    "mean_confidence": round(float(confidence[in_bin].mean()), 3),
+                    "agreement_with_llm": round(float(correct[in_bin].mean()), 3)
+                })
+        calibration_error = sum(
+            row["pages"] * abs(row["mean_confidence"] - row["agreement_with_llm"]) for row in reliability
+        ) / len(labels)
+
+        return {
+            "holdout_examples": int(len(labels)),
+            "temperature": round(float(model["temperature"]), 3),
+            "agreement_with_llm": round(float(correct.mean()), 3),
+            "within_one_level": round(float((np.abs(predicted - labels) <= 1).mean()), 3),
+            "threshold": self.threshold,
+            "handled_locally": round(float(confident.mean()), 3),
+            "agreement_when_handled_locally": round(float(correct[confident].mean()), 3) if confident.any() else None,
+            "expected_calibration_error": round(float(calibration_error), 3),
+            "reliability": reliability,
+            "llm_label_counts": np.bincount(labels, minlength=LEVELS).tolist()
+        }
+
+    def calibration_report(self) -> Dict:
+        with self._lock:
+            report = dict(self._report) or {"trained": False, "min_examples": self.min_examples}
+            report["collected_examples"] = len(self._labels)
+            report.update(self._stats)
+        served = report["local"] + report["escalated"]
+        report["local_rate"] = report["local"] / served if served else 0.0
+        return report
+
+    def _path(self, name: str) -> str:
+        return os.path.join(self.folder, name)
+
+    def _save_examples(self):
+        with self._lock:
+            if not self._labels or len({len(x) for x in self._examples}) > 1:
+                return
+            features = np.stack(self._examples)
+            labels = np.array(self._labels, dtype=np.int8)
+            ids = np.array(self._ids)
+            self._unsaved = 0
+        tmp_path = self._path(f"examples.{os.getpid()}.{threading.get_ident()}.tmp.npz")
+        np.savez(tmp_path, features=features, labels=labels, ids=ids)
+        os.replace(tmp_path, self._path("examples.npz"))
+
+    def _save(self, model: Dict[str, np.ndarray], report: Dict):
+        self._save_examples()
+        tmp_path = self._path(f"model.{os.getpid()}.{threading.get_ident()}.tmp.npz")
+        np.savez(tmp_path, **model)
+        os.replace(tmp_path, self._path("model.npz"))
+        with open(self._path("report.json"), "w", encoding="utf-8") as f:
+            json.dump(report, f, indent=4)
+
+    def _load(self):
+        try:
+            with np.load(self._path("examples.npz")) as data:
+                self._examples = list(data["features"])
+                self._labels = data["labels"].astype(int).tolist()
+                self._ids = data["ids"].tolist()
+                self._seen = set(self._ids)
+            with np.load(self._path("model.npz")) as data:
+                self._model = {name: data[name] for name in data.files}
+            with open(self._path("report.json"), "r", encoding="utf-8") as f:
+                self._report = json.load(f)
+        except FileNotFoundError:
+            pass
+        except (OSError, ValueError, KeyError) as e:
+            print(f"Error loading complexity classifier from {self.folder}: {e}")
@@ -0,0 +1,136 @@
+import os
+import re
+import gzip
+import json
+import threading
+from typing import Any, Optional
+
+KEY_PATTERN = re.compile(r'^[0-9A-Za-z_-]{1,128}$')
+
+class DiskCache:
+    """Size-bounded cache of JSON values stored one file per key.
+
+    Keys are content hashes, so an entry never needs invalidating; entries are
+    only removed when the cache grows past max_bytes (least recently used
+    first) or when they are purged explicitly.
+    """
+    suffix = ".json"
+
+    def __init__(self, folder: str, max_bytes: int = 256 * 1024 * 1024):
+        self.folder = folder
+        self.max_bytes = max_bytes
+        self._lock = threading.Lock()
+        os.makedirs(folder, exist_ok=True)
+
+    def _path(self, key: str) -> str:
+        if not KEY_PATTERN.match(key or ''):
+            raise ValueError(f"Invalid cache key: {key}")
+        return os.path.join(self.folder, f"{key}{self.suffix}")
+
+    def _load(self, path: str) -> Any:
+        with open(path, "r", encoding="utf-8") as f:
+            return json.load(f)
+
+    def _dump(self, value: Any, path: str):
+        with open(path, "w", encoding="utf-8") as f:
+            json.dump(value, f, indent=4)
+
+    def get(self, key: str) -> Optional[Any]:
+        """Return the cached value for key, or None if it is not cached"""
+        path = self._path(key)
+        try:
+            value = self._load(path)
+        except FileNotFoundError:
+            return None
+        except (OSError, EOFError, json.JSONDecodeError) as e:
+            print(f"Error reading cache entry {key}: {e}")
+            return None
+
+        # Touch the file so eviction sees it as recently used
+        try:
+            os.utime(path)
+        except OSError:
+            pass
+        return value
+
+    def set(self, key: str, value: Any):
+        """Store value under key, evicting old entries if over the size limit"""
+        path = self._path(key)
+        # Thread idents repeat across processes, so server workers sharing the
+        # folder need the pid too to never write the same temporary file
+        tmp_path = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+        try:
+            self._dump(value, tmp_path)
+            os.replace(tmp_path, path)
+        except BaseException:
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+            raise
+        self._evict()
+
+    def purge(self, key: Optional[str] = None) -> int:
+        """Remove one entry, or every entry when key is None. Returns the number removed"""
+        with self._lock:
+            if key is not None:
+                try:
+                    os.remove(self._path(key))
+                    return 1
+                except FileNotFoundError:
+                    return 0
+
+            removed = 0
+            for name in os.listdir(self.folder):
+                if name.endswith(self.suffix):
+                    os.remove(os.path.join(self.folder, name))
+                    removed += 1
+            return removed
+
+    def stats(self) -> dict:
+        entries = self._entries()
+        return {
+            "entries": len(entries),
+            "bytes": sum(size for _, size, _ in entries),
+            "max_bytes": self.max_bytes
+        }
+
+    def _entries(self):
+        entries = []
+        for name in os.listdir(self.folder):
+            if not name.endswith(self.suffix):
+                continue
+            path = os.path.join(self.folder, name)
+            try:
+                stat = os.stat(path)
+            except FileNotFoundError:
+                continue
+            entries.append((path, stat.st_size, stat.st_mtime))
+        return entries
+
+    def _evict(self):
+        with self._lock:
+            entries = self._entries()
+            total = sum(size for _, size, _ in entries)
+            if total <= self.max_bytes:
+                return
+
+            # Oldest access time first
+            for path, size, _ in sorted(entries, key=lambda entry: entry[2]):
+                if total <= self.max_bytes:
+                    break
+                try:
+                    os.remove(path)
+                    total -= size
+                except FileNotFoundError:
+                    pass
+
+class CompressedDiskCache(DiskCache):
+    """DiskCache that gzips each entry, for large values such as HTML pages"""
+    suffix = ".json.gz"
+
+    def _load(self, path: str) -> Any:
+        with gzip.open(path, "rt", encoding="utf-8") as f:
+            return json.load(f)
+
+    def _dump(self, value: Any, path: str):
+        with gzip.open(path, "wt", encoding="utf-8", compresslevel=6) as f:
+            json.dump(value, f)
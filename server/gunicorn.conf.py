@@ -0,0 +1,32 @@
+# Run with: gunicorn -c gunicorn.conf.py app:app
+#
+# The app is imported once in the master with the semantic search model
+# loaded, then workers are forked from it. The model weights are never
+# written to after loading, so the workers share those pages copy-on-write
+# instead of each loading their own ~400 MB copy.
+#
+# Preloading only happens when the model runs on the CPU. A CUDA context
+# can't be carried into a forked child ("Cannot re-initialize CUDA in forked
+# subprocess"), so on a GPU host the master skips it and every worker loads
+# the model onto the GPU the first time it needs it.
+import os
+
+os.environ.setdefault('ALIMER_PRELOAD_MODEL', '1')
+
+bind = os.environ.get('ALIMER_BIND', '0.0.0.0:5000')
+workers = int(os.environ.get('WEB_CONCURRENCY', '2'))
+# Each worker starts its own PDF extraction pool; share the cores between
+# them instead of giving every worker one process per core
+os.environ.setdefault('ALIMER_EXTRACTION_WORKERS', str(max(1, (os.cpu_count() or 1) // workers)))
+preload_app = True
+# Summaries of large PDFs can take minutes
+timeout = 600
+
+def post_fork(server, worker):
+    # Keep each worker from spawning one torch thread per core
+    import torch
+    torch.set_num_threads(max(1, (os.cpu_count() or 1) // workers))
+
+def post_worker_init(worker):
+    from app import report_startup
+    report_startup(f"Worker {worker.age}")
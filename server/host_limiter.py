@@ -0,0 +1,40 @@
+import threading
+import time
+from contextlib import contextmanager
+from urllib.parse import urlparse
+
+class HostLimiter:
+    """Politeness limits for fetching many URLs at once.
+
+    Each host gets at most max_per_host requests in flight and successive
+    requests to it start at least min_interval seconds apart, while requests
+    to different hosts run freely in parallel. This replaces a global sleep
+    between fetches, which idles on every host to protect any one of them.
+    """
+    def __init__(self, max_per_host: int = 1, min_interval: float = 1.0):
+        self.max_per_host = max_per_host
+        self.min_interval = min_interval
+        self._slots = {}
+        self._next_start = {}
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def host(url: str) -> str:
+        return urlparse(url).netloc.lower()
+
+    @contextmanager
+    def limit(self, url: str):
+        """Hold one of the host's slots, waiting for its interval, while the request runs"""
+        host = self.host(url)
+        with self._lock:
+            slots = self._slots.setdefault(host, threading.Semaphore(self.max_per_host))
+        with slots:
+            with self._lock:
+                # Reserve the next start time before sleeping so concurrent
+                # callers for the same host queue up behind each other
+                start = max(time.monotonic(), self._next_start.get(host, 0.0))
+                self._next_start[host] = start + self.min_interval
+            delay = start - time.monotonic()
+            if delay > 0:
+                time.sleep(delay)
+            yield
@@ -0,0 +1,129 @@
+import hashlib
+import re
+import threading
+import time
+from email.utils import parsedate_to_datetime
+from typing import Callable, Dict, Optional
+import requests
+from disk_cache import CompressedDiskCache
+
+MAX_AGE_PATTERN = re.compile(r'(?:^|,)\s*max-age\s*=\s*"?(\d+)"?', re.IGNORECASE)
+
+def _http_date(value: Optional[str]) -> Optional[float]:
+    if not value:
+        return None
+    try:
+        return parsedate_to_datetime(value).timestamp()
+    except (TypeError, ValueError, IndexError):
+        return None
+
+def freshness_lifetime(headers, default_max_age: float) -> Optional[float]:
+    """Seconds a response may be reused without asking the server, or None if it must not be stored.
+
+    Follows Cache-Control (no-store, no-cache, max-age) and then Expires;
+    responses with neither fall back to default_max_age.
+    """
+    cache_control = headers.get('Cache-Control', '').lower()
+    directives = {part.split('=', 1)[0].strip() for part in cache_control.split(',')}
+    if 'no-store' in directives:
+        return None
+    if 'no-cache' in directives:
+        return 0.0
+    max_age = MAX_AGE_PATTERN.search(cache_control)
+    if max_age:
+        return float(max_age.group(1))
+    expires = headers.get('Expires')
+    if expires is not None:
+        expires_at = _http_date(expires)
+        date = _http_date(headers.get('Date')) or time.time()
+        # An unparseable Expires means already expired
+        return max(0.0, expires_at - date) if expires_at is not None else 0.0
+    return default_max_age
+
+class HttpCache:
+    """On-disk cache of GET responses with conditional revalidation.
+
+    Bodies are stored gzipped together with their ETag and Last-Modified
+    validators. A fresh entry is returned without touching the network; a
+    stale one is revalidated with If-None-Match / If-Modified-Since, so an
+    unchanged page costs a 304 instead of a full download. The store is
+    capped at max_bytes and evicts the least recently used pages.
+    """
+    def __init__(self, folder: str, max_bytes: int = 128 * 1024 * 1024, default_max_age: float = 0.0):
+        self.store = CompressedDiskCache(folder, max_bytes=max_bytes)
+        self.default_max_age = default_max_age
+        self._lock = threading.Lock()
+        self._stats = {"fresh_hits": 0, "revalidated": 0, "misses": 0, "not_stored": 0}
+
+    @staticmethod
+    def _key(url: str) -> str:
+        return hashlib.sha256(url.encode('utf-8')).hexdigest()
+
+    def _count(self, name: str):
+        with self._lock:
+            self._stats[name] += 1
+
+    def get(self, url: str, send: Callable[[str, Dict], requests.Response], headers: Optional[Dict] = None) -> str:
+        """The body of url, from the cache when it is fresh or still valid.
+
+        send(url, headers) performs the actual GET and is only called on a
+        miss or to revalidate. Raises requests.RequestException like
+        raise_for_status would.
+        """
+        key = self._key(url)
+        entry = self.store.get(key)
+        now = time.time()
+        if entry is not None and entry["url"] == url and now < entry["fresh_until"]:
+            self._count("fresh_hits")
+            return entry["body"]
+
+        request_headers = dict(headers or {})
+        if entry is not None and entry["url"] == url:
+            if entry.get("etag"):
+                request_headers['If-None-Match'] = entry["etag"]
+            if entry.get("last_modified"):
+                request_headers['If-Modified-Since'] = entry["last_modified"]
+        else:
+            entry = None
+
+        response = send(url, request_headers)
+        if response.status_code == 304 and entry is not None:
+            self._count("revalidated")
+            lifetime = freshness_lifetime(response.headers, self.default_max_age)
+            if lifetime is None:
+                self.store.purge(key)
+            else:
+                entry["fresh_until"] = now + lifetime
+                entry["etag"] = response.headers.get('ETag', entry.get("etag"))
+                entry["last_modified"] = response.headers.get('Last-Modified', entry.get("last_modified"))
+                self.store.set(key, entry)
+            return entry["body"]
+
+        response.raise_for_status()
+        self._count("misses")
+        body = response.text
+        lifetime = freshness_lifetime(response.headers, self.default_max_age)
+        etag, last_modified = response.headers.get('ETag'), response.headers.get('Last-Modified')
+        # Keep a response if it can be reused as is or revalidated later
+        if lifetime is not None and (lifetime > 0 or etag or last_modified):
+            self.store.set(key, {
+                "url": url,
+                "body": body,
+                "etag": etag,
+                "last_modified": last_modified,
+                "fresh_until": now + lifetime
+            })
+        else:
+            self._count("not_stored")
+        return body
+
+    def purge(self, url: Optional[str] = None) -> int:
+        return self.store.purge(None if url is None else self._key(url))
+
+    def stats(self) -> Dict:
+        with self._lock:
+            stats = dict(self._stats)
+        requests_seen = stats["fresh_hits"] + stats["revalidated"] + stats["misses"]
+        stats["hit_rate"] = (stats["fresh_hits"] + stats["revalidated"]) / requests_seen if requests_seen else 0.0
+        stats.update(self.store.stats())
+        return stats
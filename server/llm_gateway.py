@@ -0,0 +1,213 @@
+import os
+import asyncio
+import concurrent.futures
+import queue
+import threading
+import time
+from typing import Dict, Iterator, List, Optional
+import httpx
+import ollama
+
+# How much longer than its own timeout a blocking caller waits for a call
+# before giving up on the gateway loop altogether
+RESULT_GRACE_SECONDS = 5.0
+
+class QueueFullError(RuntimeError):
+    """Raised when more calls are waiting for the model than the gateway allows"""
+
+class LLMGateway:
+    """Shared client for the local Ollama server.
+
+    Calls run on one asyncio loop in a background thread, using a single
+    pooled HTTP client. At most max_concurrency generations run at once; up
+    to max_queue more wait their turn and anything beyond that is rejected
+    straight away instead of parking another worker thread. Flask handlers
+    use the blocking chat(); code already on the loop can await achat().
+    """
+    def __init__(self, host: Optional[str] = None, max_concurrency: int = 4, max_queue: int = 64,
+                 timeout: float = 120.0):
+        self.host = host
+        self.max_concurrency = max_concurrency
+        self.max_queue = max_queue
+        self.timeout = timeout
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._client: Optional[ollama.AsyncClient] = None
+        self._semaphore: Optional[asyncio.Semaphore] = None
+        self._start_lock = threading.Lock()
+        self._stats_lock = threading.Lock()
+        self._pending = 0
+        self._stats = {
+            "calls": 0,
+            "failures": 0,
+            "timeouts": 0,
+            "rejected": 0,
+            "queue_wait_seconds": 0.0,
+            "max_queue_wait_seconds": 0.0,
+            "generation_seconds": 0.0
+        }
+
+    def _ensure_started(self) -> asyncio.AbstractEventLoop:
+        # Started lazily so forked server workers each get their own loop
+        if self._loop is None:
+            with self._start_lock:
+                if self._loop is None:
+                    loop = asyncio.new_event_loop()
+                    threading.Thread(target=loop.run_forever, name="llm-gateway", daemon=True).start()
+                    asyncio.run_coroutine_threadsafe(self._setup(), loop).result()
+                    self._loop = loop
+        return self._loop
+
+    async def _setup(self):
+        limits = httpx.Limits(max_connections=self.max_concurrency, max_keepalive_connections=self.max_concurrency)
+        self._client = ollama.AsyncClient(host=self.host, timeout=self.timeout, limits=limits)
+        self._semaphore = asyncio.Semaphore(self.max_concurrency)
+
+    def _record(self, **values):
+        with self._stats_lock:
+            for key, value in values.items():
+                self._stats[key] += value
+
+    async def _acquire(self, deadline: float) -> float:
+        """Wait for a concurrency slot until deadline and return the time spent waiting"""
+        enqueued = time.perf_counter()
+        try:
+            await asyncio.wait_for(self._semaphore.acquire(), max(deadline - enqueued, 0))
+        except asyncio.TimeoutError:
+            self._record(calls=1, timeouts=1, failures=1, queue_wait_seconds=time.perf_counter() - enqueued)
+            raise
+        queue_wait = time.perf_counter() - enqueued
+        with self._stats_lock:
+            self._stats["max_queue_wait_seconds"] = max(self._stats["max_queue_wait_seconds"], queue_wait)
+        return queue_wait
+
+    async def achat(self, model: str, messages: List[Dict], options: Optional[Dict] = None,
+                    format: str = '', timeout: Optional[float] = None):
+        """Run one chat completion on the gateway loop.
+
+        timeout covers the whole call, waiting for a free slot included.
+        """
+        deadline = time.perf_counter() + (timeout or self.timeout)
+        queue_wait = await self._acquire(deadline)
+        started = time.perf_counter()
+        try:
+            response = await asyncio.wait_for(
+                self._client.chat(model=model, messages=messages, options=options, format=format),
+                max(deadline - started, 0)
+            )
+        except asyncio.TimeoutError:
+            self._record(calls=1, timeouts=1, failures=1, queue_wait_seconds=queue_wait,
+                         generation_seconds=time.perf_counter() - started)
+            raise
+        except Exception:
+            self._record(calls=1, failures=1, queue_wait_seconds=queue_wait,
+                         generation_seconds=time.perf_counter() - started)
+            raise
+        finally:
+            self._semaphore.release()
+        self._record(calls=1, queue_wait_seconds=queue_wait, generation_seconds=time.perf_counter() - started)
+        return response
+
+    def chat(self, model: str, messages: List[Dict], options: Optional[Dict] = None,
+             format: str = '', timeout: Optional[float] = None):
+        """Blocking chat completion for callers outside the gateway loop"""
+        loop = self._ensure_started()
+        with self._stats_lock:
+            if self._pending >= self.max_concurrency + self.max_queue:
+                self._stats["rejected"] += 1
+                raise QueueFullError("Too many requests are waiting for the language model")
+            self._pending += 1
+        try:
+            future = asyncio.run_coroutine_threadsafe(
+                self.achat(model, messages, options=options, format=format, timeout=timeout), loop
+            )
+            try:
+                # achat enforces the timeout itself; this only guards against a stuck loop
+                return future.result(timeout=(timeout or self.timeout) + RESULT_GRACE_SECONDS)
+            except concurrent.futures.TimeoutError:
+                future.cancel()
+                raise
+        finally:
+            with self._stats_lock:
+                self._pending -= 1
+
+    async def _astream(self, model: str, messages: List[Dict], options: Optional[Dict],
+                       timeout: Optional[float], out: queue.Queue):
+        deadline = time.perf_counter() + (timeout or self.timeout)
+        try:
+            queue_wait = await self._acquire(deadline)
+        except asyncio.TimeoutError as e:
+            out.put(('error', e))
+            return
+        started = time.perf_counter()
+
+        async def consume():
+            stream = await self._client.chat(model=model, messages=messages, options=options, stream=True)
+            async for part in stream:
+                if part['message']['content']:
+                    out.put(('token', part['message']['content']))
+
+        try:
+            await asyncio.wait_for(consume(), max(deadline - started, 0))
+        except asyncio.CancelledError:
+            self._record(calls=1, failures=1, queue_wait_seconds=queue_wait,
+                         generation_seconds=time.perf_counter() - started)
+            raise
+        except Exception as e:
+            self._record(calls=1, failures=1, timeouts=int(isinstance(e, asyncio.TimeoutError)),
+                         queue_wait_seconds=queue_wait, generation_seconds=time.perf_counter() - started)
+            out.put(('error', e))
+            return
+        finally:
+            self._semaphore.release()
+        self._record(calls=1, queue_wait_seconds=queue_wait, generation_seconds=time.perf_counter() - started)
+        out.put(('done', None))
+
+    def stream_chat(self, model: str, messages: List[Dict], options: Optional[Dict] = None,
+                    timeout: Optional[float] = None) -> Iterator[str]:
+        """Yield the response text piece by piece as Ollama generates it.
+
+        Closing the generator early (for example when the HTTP client goes
+        away) cancels the generation and frees its concurrency slot.
+        """
+        loop = self._ensure_started()
+        with self._stats_lock:
+            if self._pending >= self.max_concurrency + self.max_queue:
+                self._stats["rejected"] += 1
+                raise QueueFullError("Too many requests are waiting for the language model")
+            self._pending += 1
+
+        out: queue.Queue = queue.Queue()
+        future = asyncio.run_coroutine_threadsafe(self._astream(model, messages, options, timeout, out), loop)
+        try:
+            while True:
+                kind, value = out.get()
+                if kind == 'token':
+                    yield value
+                elif kind == 'error':
+                    raise value
+                else:
+                    return
+        finally:
+            if not future.done():
+                future.cancel()
+            with self._stats_lock:
+                self._pending -= 1
+
+    def stats(self) -> Dict:
+        with self._stats_lock:
+            stats = dict(self._stats)
+            stats["pending"] = self._pending
+        completed = max(stats["calls"], 1)
+        stats["mean_queue_wait_seconds"] = stats["queue_wait_seconds"] / completed
+        stats["mean_generation_seconds"] = stats["generation_seconds"] / completed
+        stats["max_concurrency"] = self.max_concurrency
+        stats["max_queue"] = self.max_queue
+        return stats
+
+def gateway_from_env() -> LLMGateway:
+    return LLMGateway(
+        host=os.environ.get('OLLAMA_HOST'),
+        max_concurrency=int(os.environ.get('ALIMER_LLM_CONCURRENCY', '4')),
+        max_queue=int(os.environ.get('ALIMER_LLM_QUEUE', '64')),
+        timeout=float(os.environ.get('ALIMER_LLM_TIMEOUT', '120'))
+    )
@@ -1,13 +1,12 @@
-import pdfplumber
 import os
 import json
-from concurrent.futures import ThreadPoolExecutor
-from sentence_transformers import SentenceTransformer, util
 import ollama
-import torch
+from pdf_extraction import extract_pages
+from retrieval import RetrievalEngine
+from chunking import chunk_text
 
 # Function to extract text from a PDF and save it to a text file
-def extract_text_from_pdf(pdf_path, output_txt_file):
+def extract_text_from_pdf(pdf_path, output_txt_file, parallel=None):
     try:
         # Check if the file exists
         if not os.path.exists(pdf_path):
@@ -17,15 +16,8 @@ def extract_text_from_pdf(pdf_path, output_txt_file):
         if not pdf_path.lower().endswith('.pdf'):
             raise ValueError("The file is not a PDF.")
         
-        extracted_text = []
-        with pdfplumber.open(pdf_path) as pdf:
-            for page_num, page in enumerate(pdf.pages):
-                text = page.extract_text()
-                if text:
-                    extracted_text.append({
-                        "page": page_num + 1,
-                        "text": text.strip()
-                    })
+        # Pages are extracted in a process pool for large PDFs
+        extracted_text = extract_pages(pdf_path, parallel=parallel)
         
         # Save the extracted text to a structured text file
         with open(output_txt_file, "w", encoding="utf-8") as f:
@@ -46,51 +38,24 @@ def load_text_from_file(txt_file):
         print(f"Error loading text file: {e}")
         return []
 
-# Function to chunk text into smaller parts
-def chunk_text(text_data, chunk_size=500, overlap=100):
-    chunks = []
-    for entry in text_data:
-        words = entry["text"].split()
-        for i in range(0, len(words), chunk_size - overlap):
-            chunk = " ".join(words[i:i + chunk_size])
-            chunks.append({
-                "page": entry["page"],
-                "text": chunk
-            })
-    return chunks
-
 # Function to initialize semantic search
 def initialize_tools():
-    print("Loading semantic search model. Please wait...")
-    
     # Use a more robust embedding model for longer documents
-    retriever_model = SentenceTransformer('all-mpnet-base-v2')
+    retrieval_engine = RetrievalEngine('all-mpnet-base-v2')
+    retrieval_engine.model  # Load now rather than on the first question
     
-    print("Semantic search model loaded successfully!")
-    return retriever_model
+    return retrieval_engine
 
-# Function to perform semantic search
-def retrieve_relevant_context(query, text_chunks, retriever_model, top_k=5):
-    # Ensure CUDA is used if available
-    device = 'cuda' if torch.cuda.is_available() else 'cpu'
-    retriever_model = retriever_model.to(device)
-    
-    query_embedding = retriever_model.encode(query, convert_to_tensor=True).to(device)
+# Function to encode every chunk once, ahead of the questions
+def build_chunk_matrix(text_chunks, retrieval_engine):
     chunk_texts = [chunk["text"] for chunk in text_chunks]
-    chunk_embeddings = retriever_model.encode(chunk_texts, convert_to_tensor=True).to(device)
-    
-    # Compute cosine similarity between query and chunks
-    scores = util.pytorch_cos_sim(query_embedding, chunk_embeddings)[0]
-    
-    # Ensure top_k does not exceed the number of chunks
-    top_k = min(top_k, len(scores))
-    
-    if top_k == 0:
-        return []  # No relevant context found
-    
-    top_results = scores.topk(k=top_k)
-    relevant_chunks = [text_chunks[idx] for idx in top_results.indices]
-    return relevant_chunks
+    return retrieval_engine.prepare(retrieval_engine.encode(chunk_texts))
+
+# Function to perform semantic search against the precomputed chunk matrix
+def retrieve_relevant_context(query, text_chunks, retrieval_engine, chunk_matrix, top_k=5):
+    query_embedding = retrieval_engine.encode([query])
+    _, indices = retrieval_engine.search(query_embedding, chunk_matrix, top_k=top_k)
+    return [text_chunks[idx] for idx in indices[0].tolist()]
 
 # Function to generate an answer using local Ollama model
 def generate_answer(prompt):
@@ -119,15 +84,11 @@ def generate_answer(prompt):
         print(f"\nChatbot: An error occurred while generating the answer: {e}")
         return "Sorry, I couldn't generate an answer due to a local model error."
 
-# Function to process chunks in parallel
-def process_chunks(query, text_chunks, retriever_model):
-    with ThreadPoolExecutor() as executor:
-        futures = [executor.submit(retrieve_relevant_context, query, [chunk], retriever_model) for chunk in text_chunks]
-        relevant_contexts = [future.result() for future in futures]
-    return [chunk for sublist in relevant_contexts for chunk in sublist]  # Flatten the list
-
 # Chatbot interaction
-def chatbot_interaction(text_chunks, retriever_model):
+def chatbot_interaction(text_chunks, retrieval_engine):
+    # Chunks are encoded once and reused for every question
+    chunk_matrix = build_chunk_matrix(text_chunks, retrieval_engine)
+    
     print("\nChatbot: What do you want to learn more about this PDF?")
     print("(Type 'exit' to end the chat.)")
     
@@ -137,8 +98,8 @@ def chatbot_interaction(text_chunks, retriever_model):
             print("\nChatbot: Goodbye!")
             break
         
-        # Retrieve relevant context in parallel
-        relevant_chunks = process_chunks(user_query, text_chunks, retriever_model)
+        # Retrieve the most relevant chunks with one query encode and one search
+        relevant_chunks = retrieve_relevant_context(user_query, text_chunks, retrieval_engine, chunk_matrix)
         
         if relevant_chunks:
             print("\nChatbot: Let me generate an answer for you...")
@@ -163,12 +124,12 @@ if __name__ == "__main__":
 
     if extracted_text:
         print("PDF analysis complete. Loading tools...")
-        retriever_model = initialize_tools()
+        retrieval_engine = initialize_tools()
         
-        # Load the extracted text from the text file
-        text_chunks = chunk_text(extracted_text, chunk_size=750, overlap=150)
+        # Chunk by the model's own token counts so nothing is truncated when encoded
+        text_chunks = chunk_text(extracted_text, tokenizer=retrieval_engine.tokenizer, max_tokens=retrieval_engine.max_tokens)
         
         # Start chatbot interaction
-        chatbot_interaction(text_chunks, retriever_model)
+        chatbot_interaction(text_chunks, retrieval_engine)
     else:
         print("Failed to analyze the PDF. Please check the file and try again.")
\ No newline at end of file
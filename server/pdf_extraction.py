@@ -0,0 +1,120 @@
+import os
+import threading
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from typing import Dict, Iterator, List, Optional
+import pdfplumber
+
+# Below this many pages handing ranges to worker processes outweighs the gain
+PARALLEL_MIN_PAGES = 40
+
+def default_workers() -> int:
+    """Extraction processes per server process: ALIMER_EXTRACTION_WORKERS, or
+    one per core. gunicorn.conf.py divides the cores between its workers so
+    that W workers don't start W * cores extraction processes"""
+    configured = os.environ.get('ALIMER_EXTRACTION_WORKERS')
+    if configured:
+        return max(1, int(configured))
+    return os.cpu_count() or 1
+
+_pool: Optional[ProcessPoolExecutor] = None
+_pool_workers = 0
+_pool_lock = threading.Lock()
+
+def _get_pool(workers: int) -> ProcessPoolExecutor:
+    """The process pool shared by every extraction, started on first use.
+
+    By then the server process runs several threads (the LLM gateway loop,
+    the question bank refill worker, torch's pools), and forking a
+    multithreaded process can deadlock, so workers are started with
+    forkserver where it exists and spawn elsewhere.
+    """
+    global _pool, _pool_workers
+    with _pool_lock:
+        if _pool is None or _pool_workers != workers:
+            if _pool is not None:
+                _pool.shutdown(wait=False)
+            method = 'forkserver' if 'forkserver' in multiprocessing.get_all_start_methods() else 'spawn'
+            _pool = ProcessPoolExecutor(max_workers=workers, mp_context=multiprocessing.get_context(method))
+            _pool_workers = workers
+        return _pool
+
+def _reset_pool(pool: ProcessPoolExecutor):
+    global _pool
+    with _pool_lock:
+        if _pool is pool:
+            _pool = None
+    pool.shutdown(wait=False)
+
+def _extract_page_range(pdf_path: str, start: int, end: int) -> List[Dict]:
+    """Extract pages [start, end) of a PDF. Runs inside worker processes"""
+    extracted_text = []
+    with pdfplumber.open(pdf_path) as pdf:
+        for page_num in range(start, end):
+            text = pdf.pages[page_num].extract_text()
+            if text:
+                extracted_text.append({
+                    "page": page_num + 1,
+                    "text": text.strip()
+                })
+    return extracted_text
+
+def _split_ranges(page_count: int, parts: int) -> List[tuple]:
+    """Split page_count pages into at most parts contiguous ranges of near equal size"""
+    parts = max(1, min(parts, page_count))
+    size, remainder = divmod(page_count, parts)
+    ranges = []
+    start = 0
+    for i in range(parts):
+        end = start + size + (1 if i < remainder else 0)
+        ranges.append((start, end))
+        start = end
+    return ranges
+
+def extract_pages(pdf_path: str, parallel: Optional[bool] = None, max_workers: Optional[int] = None,
+                  min_pages: int = PARALLEL_MIN_PAGES) -> List[Dict]:
+    """Extract the text of every page as a list of {"page", "text"} entries.
+
+    Large documents are split into page ranges that are extracted in a process
+    pool, since pdfplumber is CPU bound pure Python. Small documents, or
+    parallel=False, use the serial path. Page order is preserved either way.
+    """
+    with pdfplumber.open(pdf_path) as pdf:
+        page_count = len(pdf.pages)
+
+    workers = max_workers or default_workers()
+    if parallel is None:
+        parallel = page_count >= min_pages
+    if not parallel or workers < 2 or page_count < 2:
+        return _extract_page_range(pdf_path, 0, page_count)
+
+    # A few ranges per worker keeps the pool busy when some pages are slower
+    ranges = _split_ranges(page_count, workers * 2)
+    pool = _get_pool(workers)
+    try:
+        results = pool.map(
+            _extract_page_range,
+            [pdf_path] * len(ranges),
+            [start for start, _ in ranges],
+            [end for _, end in ranges]
+        )
+        return [entry for part in results for entry in part]
+    except BrokenProcessPool:
+        # A worker died (out of memory, killed); start a fresh pool next time
+        # and finish this document serially
+        _reset_pool(pool)
+        return _extract_page_range(pdf_path, 0, page_count)
+
+def iter_pages(pdf_path: str) -> Iterator[Dict]:
+    """Yield {"page", "text"} entries one at a time as pdfplumber extracts them"""
+    with pdfplumber.open(pdf_path) as pdf:
+        for page_num, page in enumerate(pdf.pages):
+            text = page.extract_text()
+            # Drop the parsed layout of pages we are done with
+            page.close()
+            if text:
+                yield {
+                    "page": page_num + 1,
+                    "text": text.strip()
+                }
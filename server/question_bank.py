@@ -0,0 +1,191 @@
+import hashlib
+import queue
+import re
+import threading
+from collections import OrderedDict, deque
+from typing import Callable, Dict, List, Optional, Tuple
+
+def question_hash(question: Dict) -> str:
+    """Hash of a question's normalized text, used to spot repeats"""
+    text = re.sub(r'\s+', ' ', str(question.get('question', '')).strip().lower())
+    return hashlib.sha1(text.encode('utf-8')).hexdigest()
+
+class QuestionBank:
+    """Pools of pre-generated MCQs per (topic, difficulty).
+
+    Requests are served from the pool; whenever a pool drops below
+    low_watermark a background worker tops it up to target_size by calling
+    generate(topic, count, difficulty). The last history_size questions of
+    each topic and difficulty are remembered by text hash and new ones that
+    repeat them are dropped, so a question does not come back soon after it
+    was handed out. Older questions may be asked again, and when the model
+    only produces repeats those are served rather than nothing.
+    """
+    def __init__(self, generate: Callable[[str, int, Optional[int]], List[Dict]], low_watermark: int = 10,
+                 target_size: int = 30, batch_size: int = 5, max_failed_batches: int = 3,
+                 history_size: int = 200):
+        self.generate = generate
+        self.low_watermark = low_watermark
+        self.target_size = target_size
+        self.batch_size = batch_size
+        self.max_failed_batches = max_failed_batches
+        # Never shorter than a full pool, so pooled questions are not repeated
+        self.history_size = max(history_size, target_size)
+        self._pools: Dict[Tuple, deque] = {}
+        self._seen: Dict[Tuple, OrderedDict] = {}
+        self._topics: Dict[Tuple, str] = {}
+        self._refills: queue.Queue = queue.Queue()
+        self._scheduled: set = set()
+        self._lock = threading.Lock()
+        self._worker: Optional[threading.Thread] = None
+        self._stats = {"served_from_pool": 0, "generated_on_demand": 0, "refilled": 0, "duplicates_dropped": 0,
+                       "repeats_served": 0}
+
+    @staticmethod
+    def _key(topic: str, difficulty: Optional[int]) -> Tuple:
+        return (re.sub(r'\s+', ' ', topic.strip().lower()), difficulty or 0)
+
+    def _ensure_worker(self):
+        # Started on first use so each forked server worker runs its own
+        with self._lock:
+            if self._worker is None or not self._worker.is_alive():
+                self._worker = threading.Thread(target=self._run, name="question-bank", daemon=True)
+                self._worker.start()
+
+    def add(self, topic: str, difficulty: Optional[int], questions: List[Dict]) -> List[Dict]:
+        """Add unseen questions to the pool and return the ones that were new"""
+        key = self._key(topic, difficulty)
+        with self._lock:
+            self._topics.setdefault(key, topic)
+            pool = self._pools.setdefault(key, deque())
+            added = self._filter_new(key, questions)
+            pool.extend(added)
+        return added
+
+    def _filter_new(self, key: Tuple, questions: List[Dict]) -> List[Dict]:
+        seen = self._seen.setdefault(key, OrderedDict())
+        fresh = []
+        for question in questions:
+            digest = question_hash(question)
+            if digest in seen:
+                self._stats["duplicates_dropped"] += 1
+                continue
+            self._remember(seen, digest)
+            fresh.append(question)
+        return fresh
+
+    def _remember(self, seen: OrderedDict, digest: str):
+        seen[digest] = True
+        seen.move_to_end(digest)
+        while len(seen) > self.history_size:
+            seen.popitem(last=False)
+
+    def _repeats(self, key: Tuple, generated: List[Dict], served: List[Dict], count: int) -> List[Dict]:
+        """Up to count generated questions that were dropped as repeats, for when nothing new came back.
+        Questions in served (already in the caller's quiz) are not repeated"""
+        seen = self._seen.setdefault(key, OrderedDict())
+        pooled = {question_hash(q) for q in self._pools.get(key, ())}
+        used = {question_hash(q) for q in served}
+        repeats = []
+        for question in generated:
+            digest = question_hash(question)
+            # Never hand out a question that is still waiting in the pool
+            if len(repeats) >= count or digest in used or digest in pooled:
+                continue
+            used.add(digest)
+            self._remember(seen, digest)
+            repeats.append(question)
+        self._stats["repeats_served"] += len(repeats)
+        return repeats
+
+    def take(self, topic: str, difficulty: Optional[int], count: int) -> List[Dict]:
+        """Take up to count pooled questions, scheduling a refill if the pool runs low"""
+        key = self._key(topic, difficulty)
+        with self._lock:
+            self._topics.setdefault(key, topic)
+            pool = self._pools.setdefault(key, deque())
+            taken = [pool.popleft() for _ in range(min(count, len(pool)))]
+            self._stats["served_from_pool"] += len(taken)
+            running_low = len(pool) < self.low_watermark
+        if running_low:
+            self.request_refill(topic, difficulty)
+        return taken
+
+    def take_or_generate(self, topic: str, difficulty: Optional[int], count: int) -> List[Dict]:
+        """Serve from the pool, generating whatever it is short of right away"""
+        questions = self.take(topic, difficulty, count)
+        missing = count - len(questions)
+        if missing > 0:
+            generated = self.generate(topic, missing, difficulty)
+            key = self._key(topic, difficulty)
+            with self._lock:
+                fresh = self._filter_new(key, generated)
+                # Anything the model produced beyond what was asked for goes to the pool
+                self._pools[key].extend(fresh[missing:])
+                self._stats["generated_on_demand"] += len(fresh[:missing])
+                served = fresh[:missing]
+                if len(served) < missing:
+                    served += self._repeats(key, generated, questions + served, missing - len(served))
+            questions.extend(served)
+        return questions
+
+    def claim(self, topic: str, difficulty: Optional[int], questions: List[Dict]) -> List[Dict]:
+        """Record questions generated for a caller directly, returning the ones not seen recently"""
+        key = self._key(topic, difficulty)
+        with self._lock:
+            self._topics.setdefault(key, topic)
+            self._pools.setdefault(key, deque())
+            fresh = self._filter_new(key, questions)
+            self._stats["generated_on_demand"] += len(fresh)
+        return fresh
+
+    def claim_repeats(self, topic: str, difficulty: Optional[int], questions: List[Dict], served: List[Dict],
+                      count: int) -> List[Dict]:
+        """Up to count of questions that claim() dropped, to serve when the model produced nothing new"""
+        key = self._key(topic, difficulty)
+        with self._lock:
+            return self._repeats(key, questions, served, count)
+
+    def request_refill(self, topic: str, difficulty: Optional[int]):
+        key = self._key(topic, difficulty)
+        with self._lock:
+            if key in self._scheduled:
+                return
+            self._scheduled.add(key)
+            self._topics.setdefault(key, topic)
+        self._ensure_worker()
+        self._refills.put(key)
+
+    def _run(self):
+        while True:
+            key = self._refills.get()
+            try:
+                self._refill(key)
+            except Exception as e:
+                print(f"Error refilling question pool {key}: {e}")
+            finally:
+                with self._lock:
+                    self._scheduled.discard(key)
+
+    def _refill(self, key: Tuple):
+        topic, difficulty = self._topics[key], key[1] or None
+        failed_batches = 0
+        while failed_batches < self.max_failed_batches:
+            with self._lock:
+                missing = self.target_size - len(self._pools[key])
+            if missing <= 0:
+                return
+            added = self.add(topic, difficulty, self.generate(topic, min(self.batch_size, missing), difficulty))
+            with self._lock:
+                self._stats["refilled"] += len(added)
+            if not added:
+                failed_batches += 1
+
+    def stats(self) -> Dict:
+        with self._lock:
+            stats = dict(self._stats)
+            stats["pools"] = {
+                f"{topic}|{difficulty}": len(pool) for (topic, difficulty), pool in self._pools.items()
+            }
+            stats["refills_scheduled"] = len(self._scheduled)
+        return stats
@@ -0,0 +1,144 @@
+from datetime import datetime
+from typing import Callable, Dict, Iterable, Iterator, List, Optional, Tuple
+import numpy as np
+
+class ResponseRow:
+    """One answer in a ResponseLog, read with the same attributes as TopicResponse.
+
+    Rows are views: they hold only the log and a position, and each attribute
+    is read from the log's columns when asked for.
+    """
+    __slots__ = ('_log', '_index')
+
+    def __init__(self, log: 'ResponseLog', index: int):
+        self._log = log
+        self._index = index
+
+    @property
+    def question_id(self) -> str:
+        return self._log._question_ids[self._log._question[self._index]]
+
+    @property
+    def difficulty(self):
+        return self._log.difficulty_type(int(self._log._difficulty[self._index]))
+
+    @property
+    def is_correct(self) -> bool:
+        return bool(self._log._correct[self._index])
+
+    @property
+    def quality_score(self) -> float:
+        return float(self._log._quality[self._index])
+
+    @property
+    def timestamp(self) -> datetime:
+        return datetime.fromtimestamp(self._log._timestamp[self._index] / 1_000_000)
+
+    def __repr__(self):
+        return (f"ResponseRow(question_id={self.question_id!r}, difficulty={self.difficulty!r}, "
+                f"is_correct={self.is_correct}, quality_score={self.quality_score:.3f}, "
+                f"timestamp={self.timestamp.isoformat()})")
+
+class ResponseLog:
+    """Append-only answer history stored as fixed-width columns.
+
+    Difficulty and correctness are single bytes, quality a float32 and the
+    timestamp int64 microseconds since the epoch. Question ids are interned,
+    so each answer stores a uint32 index and every distinct id is kept once.
+    An answer costs 18 bytes instead of the several hundred a TopicResponse
+    with its enum, uuid string and datetime takes. Iterating or indexing
+    yields ResponseRow views, so code written against lists of TopicResponse
+    keeps working.
+    """
+    def __init__(self, difficulty_type: Callable[[int], object] = int, capacity: int = 16):
+        self.difficulty_type = difficulty_type
+        self._size = 0
+        self._difficulty = np.empty(capacity, dtype=np.uint8)
+        self._correct = np.empty(capacity, dtype=np.bool_)
+        self._quality = np.empty(capacity, dtype=np.float32)
+        self._timestamp = np.empty(capacity, dtype=np.int64)
+        self._question = np.empty(capacity, dtype=np.uint32)
+        self._question_ids: List[str] = []
+        self._question_index: Dict[str, int] = {}
+
+    def _grow(self, needed: int):
+        capacity = len(self._difficulty)
+        if needed <= capacity:
+            return
+        # Double so appends stay amortized O(1)
+        capacity = max(needed, capacity * 2)
+        for name in ('_difficulty', '_correct', '_quality', '_timestamp', '_question'):
+            column = getattr(self, name)
+            grown = np.empty(capacity, dtype=column.dtype)
+            grown[:self._size] = column[:self._size]
+            setattr(self, name, grown)
+
+    def _intern(self, question_id: str) -> int:
+        index = self._question_index.get(question_id)
+        if index is None:
+            index = len(self._question_ids)
+            self._question_ids.append(question_id)
+            self._question_index[question_id] = index
+        return index
+
+    def append(self, question_id: str, difficulty, is_correct: bool, quality_score: float,
+               timestamp: Optional[datetime] = None):
+        """Add one answer; difficulty may be an int or an enum member with an int value"""
+        self._grow(self._size + 1)
+        i = self._size
+        self._difficulty[i] = getattr(difficulty, 'value', difficulty)
+        self._correct[i] = bool(is_correct)
+        self._quality[i] = quality_score
+        self._timestamp[i] = int((timestamp or datetime.now()).timestamp() * 1_000_000)
+        self._question[i] = self._intern(question_id)
+        self._size += 1
+
+    def extend(self, responses: Iterable):
+        """Add TopicResponse objects (or anything with the same attributes)"""
+        for r in responses:
+            self.append(r.question_id, r.difficulty, r.is_correct, r.quality_score, r.timestamp)
+
+    def __len__(self) -> int:
+        return self._size
+
+    def __getitem__(self, index: int) -> ResponseRow:
+        if index < 0:
+            index += self._size
+        if not 0 <= index < self._size:
+            raise IndexError("response index out of range")
+        return ResponseRow(self, index)
+
+    def __iter__(self) -> Iterator[ResponseRow]:
+        for index in range(self._size):
+            yield ResponseRow(self, index)
+
+    def columns(self) -> Dict[str, np.ndarray]:
+        """Read-only views of the filled part of each column"""
+        columns = {
+            "difficulty": self._difficulty[:self._size],
+            "is_correct": self._correct[:self._size],
+            "quality_score": self._quality[:self._size],
+            "timestamp": self._timestamp[:self._size],
+            "question": self._question[:self._size]
+        }
+        for column in columns.values():
+            column.flags.writeable = False
+        return columns
+
+    def totals(self) -> Tuple[int, int, float, int]:
+        """(answers, correct answers, weighted difficulty, total difficulty) for the score formula"""
+        difficulty = self._difficulty[:self._size].astype(np.int64)
+        correct = self._correct[:self._size]
+        quality = self._quality[:self._size].astype(np.float64)
+        return (
+            self._size,
+            int(np.count_nonzero(correct)),
+            float(np.dot(difficulty[correct], quality[correct])),
+            int(difficulty.sum())
+        )
+
+    @property
+    def nbytes(self) -> int:
+        """Bytes held by the columns, not counting the interned question ids"""
+        return sum(getattr(self, name).nbytes
+                   for name in ('_difficulty', '_correct', '_quality', '_timestamp', '_question'))
@@ -0,0 +1,164 @@
+import threading
+import time
+from typing import List, Optional, Tuple
+import torch
+from sentence_transformers import SentenceTransformer
+
+STORAGE_DTYPES = ('float32', 'float16', 'int8')
+
+# Quantized matrices are upcast in blocks of this many rows while scoring,
+# which bounds the temporary memory a search needs
+SEARCH_BLOCK_ROWS = 65536
+
+class EmbeddingMatrix:
+    """Normalized chunk embeddings kept resident on the engine's device.
+
+    Rows are stored as float32, float16 or symmetric per-row int8 (with one
+    float32 scale per row), so dot products with a normalized query give the
+    cosine similarity.
+    """
+    def __init__(self, data: torch.Tensor, storage: str, scales: Optional[torch.Tensor] = None):
+        self.data = data
+        self.storage = storage
+        self.scales = scales
+
+    def __len__(self):
+        return self.data.shape[0] if self.data.dim() == 2 else 0
+
+    @property
+    def nbytes(self) -> int:
+        total = self.data.element_size() * self.data.nelement()
+        if self.scales is not None:
+            total += self.scales.element_size() * self.scales.nelement()
+        return total
+
+    def scores(self, queries: torch.Tensor) -> torch.Tensor:
+        """Cosine similarity of every query against every row, shape [queries, rows]"""
+        if self.storage == 'float32' or (self.storage == 'float16' and self.data.is_cuda):
+            return (queries.to(self.data.dtype) @ self.data.T).float()
+
+        # CPU half precision and int8 rows are upcast block by block
+        blocks = []
+        for start in range(0, len(self), SEARCH_BLOCK_ROWS):
+            block = self.data[start:start + SEARCH_BLOCK_ROWS].float()
+            block_scores = queries @ block.T
+            if self.scales is not None:
+                block_scores *= self.scales[start:start + SEARCH_BLOCK_ROWS]
+            blocks.append(block_scores)
+        return torch.cat(blocks, dim=1)
+
+    def dense(self) -> torch.Tensor:
+        """Float32 copy of the (dequantized) rows"""
+        data = self.data.float()
+        if self.scales is not None:
+            data = data * self.scales.unsqueeze(1)
+        return data
+
+class RetrievalEngine:
+    """SentenceTransformer pinned to one device, with batched top-k search.
+
+    The model is loaded on first use and moved to its device once, so a query
+    only costs one encode plus one matrix multiply against a prepared
+    EmbeddingMatrix.
+    """
+    def __init__(self, model_name: str, device: Optional[str] = None, storage: Optional[str] = None):
+        self.model_name = model_name
+        self.device = device or ('cuda' if torch.cuda.is_available() else 'cpu')
+        if storage is None:
+            storage = 'float16' if self.device.startswith('cuda') else 'float32'
+        if storage not in STORAGE_DTYPES:
+            raise ValueError(f"Unsupported embedding storage '{storage}', expected one of {STORAGE_DTYPES}")
+        self.storage = storage
+        self._model = None
+        self._lock = threading.Lock()
+
+    @property
+    def loaded(self) -> bool:
+        return self._model is not None
+
+    @property
+    def model(self) -> SentenceTransformer:
+        if self._model is None:
+            with self._lock:
+                if self._model is None:
+                    print("Loading semantic search model...")
+                    start = time.perf_counter()
+                    model = SentenceTransformer(self.model_name, device=self.device)
+                    model.eval()
+                    self._model = model
+                    print(f"Semantic search model loaded successfully on {self.device} in {time.perf_counter() - start:.1f}s!")
+        return self._model
+
+    @property
+    def tokenizer(self):
+        return self.model.tokenizer
+
+    @property
+    def max_tokens(self) -> int:
+        """Longest input, excluding the special tokens, that the model encodes without truncating"""
+        return self.model.max_seq_length - 2
+
+    def encode(self, texts: List[str], batch_size: int = 32) -> torch.Tensor:
+        """Encode texts into normalized float32 embeddings on the engine's device"""
+        return self.model.encode(
+            texts,
+            batch_size=batch_size,
+            convert_to_tensor=True,
+            normalize_embeddings=True,
+            show_progress_bar=False
+        )
+
+    def prepare(self, embeddings: torch.Tensor) -> EmbeddingMatrix:
+        """Normalize embeddings and store them on the device in the engine's storage dtype"""
+        if embeddings.nelement() == 0:
+            return EmbeddingMatrix(embeddings.reshape(0, 0), 'float32')
+
+        embeddings = torch.nn.functional.normalize(embeddings.float().to(self.device), dim=1)
+        if self.storage == 'float16':
+            return EmbeddingMatrix(embeddings.half(), 'float16')
+        if self.storage == 'int8':
+            scales = embeddings.abs().amax(dim=1).clamp(min=1e-12) / 127
+            data = torch.round(embeddings / scales.unsqueeze(1)).to(torch.int8)
+            return EmbeddingMatrix(data, 'int8', scales)
+        return EmbeddingMatrix(embeddings, 'float32')
+
+    def search(self, queries: torch.Tensor, matrix: EmbeddingMatrix, top_k: int = 5) -> Tuple[torch.Tensor, torch.Tensor]:
+        """Top-k scores and row indices for each query, each of shape [queries, k]"""
+        if queries.dim() == 1:
+            queries = queries.unsqueeze(0)
+        top_k = min(top_k, len(matrix))
+        if top_k == 0:
+            empty = torch.empty((queries.shape[0], 0))
+            return empty, empty.long()
+
+        scores = matrix.scores(queries.float().to(self.device))
+        top_results = scores.topk(k=top_k, dim=1)
+        return top_results.values.cpu(), top_results.indices.cpu()
+
+def max_marginal_relevance(matrix: EmbeddingMatrix, k: int, query: Optional[torch.Tensor] = None,
+                           diversity: float = 0.5) -> List[int]:
+    """Pick k rows that are relevant to query but unlike each other.
+
+    Without a query, relevance is measured against the centroid of all rows,
+    i.e. what the document is mostly about. diversity trades relevance (0)
+    for coverage (1).
+    """
+    k = min(k, len(matrix))
+    if k <= 0:
+        return []
+
+    rows = matrix.dense().cpu()
+    if query is None:
+        query = rows.mean(dim=0)
+    query = torch.nn.functional.normalize(query.float().cpu(), dim=0)
+    relevance = rows @ query
+
+    selected = [int(relevance.argmax())]
+    redundancy = rows @ rows[selected[0]]
+    for _ in range(k - 1):
+        scores = (1 - diversity) * relevance - diversity * redundancy
+        scores[selected] = float('-inf')
+        best = int(scores.argmax())
+        selected.append(best)
+        redundancy = torch.maximum(redundancy, rows @ rows[best])
+    return selected